@@ -1,18 +1,30 @@
 # api/routes_oauth.py
 import os
+import gzip
+import time
+import random
+import string
+import asyncio
 import logging
 import urllib.parse
-import requests  # Required for real-time token exchange
-from fastapi import APIRouter, Depends, Request, HTTPException, File, UploadFile, Form
-from fastapi.responses import RedirectResponse, HTMLResponse
-import shutil
+from functools import lru_cache
+from datetime import datetime, timedelta
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Awaitable, Callable, Optional
+import httpx  # Async client for real-time token exchange
+from fastapi import APIRouter, Depends, Request, HTTPException
+from fastapi.responses import RedirectResponse, HTMLResponse, ORJSONResponse
 from sqlalchemy import text
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from google_auth_oauthlib.flow import Flow
+from itsdangerous import URLSafeTimedSerializer, BadSignature
 from dotenv import load_dotenv
 
-from database.session import get_db
-from database.models import SocialCredential
+from database.session import get_db, AsyncSessionLocal
+from database.models import SocialCredential, CREDENTIAL_ACCOUNT_KEY
+from publishers.youtube import load_youtube_client_secrets, load_youtube_client_config
 
 # Load environment variables
 load_dotenv()
@@ -24,442 +36,663 @@ os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
 
 router = APIRouter(
     prefix="/api/v1/oauth",
-    tags=["OAuth Operations"]
+    tags=["OAuth Operations"],
+    default_response_class=ORJSONResponse  # orjson renders straight to bytes
 )
 
 # --- GLOBAL CONFIGURATION ---
-BASE_URL = os.getenv("DOMAIN_URL", "https://evo-omni-engine.duckdns.org")
+@dataclass(frozen=True, slots=True)
+class OAuthSettings:
+    """
+    Environment-driven OAuth configuration, read once at import.
+    """
+    base_url: str
+    tiktok_client_id: Optional[str]
+    tiktok_client_secret: Optional[str]
+    meta_app_id: Optional[str]
+    meta_app_secret: Optional[str]
+    state_secret: str
+    instagram_default_page: str
+
+
+SETTINGS = OAuthSettings(
+    base_url=os.getenv("DOMAIN_URL", "https://evo-omni-engine.duckdns.org"),
+    tiktok_client_id=os.getenv("TIKTOK_CLIENT_ID"),
+    tiktok_client_secret=os.getenv("TIKTOK_CLIENT_SECRET"),
+    meta_app_id=os.getenv("FACEBOOK_APP_ID"),
+    meta_app_secret=os.getenv("FACEBOOK_APP_SECRET"),
+    state_secret=os.getenv("OAUTH_STATE_SECRET"),
+    instagram_default_page=os.getenv("INSTAGRAM_DEFAULT_PAGE", "El origen del todo")
+)
 
 # --- YOUTUBE CONFIGURATION ---
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-CLIENT_SECRETS_FILE = os.path.join(BASE_DIR, "credentials", "client_secret_251021151101.json")
+# Client secrets file and its cached parse live in publishers/youtube.py (shared with token refresh)
 YOUTUBE_SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
 
-# --- TIKTOK CREDENTIALS ---
-TIKTOK_CLIENT_ID = os.getenv("TIKTOK_CLIENT_ID")
-TIKTOK_CLIENT_SECRET = os.getenv("TIKTOK_CLIENT_SECRET")
+# --- SUPPORTED PLATFORMS & CALLBACK URLS ---
+_ALLOWED_PLATFORMS = frozenset({"youtube", "tiktok", "instagram"})
+_REDIRECT_URIS = {p: f"{SETTINGS.base_url}/api/v1/oauth/callback/{p}" for p in _ALLOWED_PLATFORMS}
+
+# --- SIGNED OAUTH STATE ---
+# The state carries the client id signed with HMAC, so callbacks can't be forged or replayed later.
+_STATE_MAX_AGE = 600  # seconds the user has to complete the provider consent screen
+
+# Shared by every worker and restart: a callback may land on a different process than its /login
+if not SETTINGS.state_secret:
+    raise ValueError("CRITICAL: OAUTH_STATE_SECRET environment variable is not set in the .env file.")
+
+_SIGNER = URLSafeTimedSerializer(SETTINGS.state_secret, salt="oauth-state")
+
+# --- AUTHORIZATION URL CACHE ---
+# Finished login URLs per (platform, client_id). The TTL stays well below _STATE_MAX_AGE
+# so a cached URL always carries a state that is still valid when the user comes back.
+AUTH_URL_CACHE_TTL = 60  # seconds
+AUTH_URL_CACHE_MAX_SIZE = 1024
+_auth_url_cache = {}
+
+# --- IN-FLIGHT TOKEN EXCHANGES ---
+# (client_id, platform, code) -> running exchange task. Codes are single-use, so only callbacks
+# replaying the same code are duplicates; they await the first exchange instead of burning the code
+_inflight: dict[tuple[int, str, str], asyncio.Task] = {}
+
+# --- SHARED ASYNC HTTP CLIENT ---
+# Reused across callbacks so TLS sessions and keep-alive connections are pooled.
+# Closed by the application lifespan on shutdown.
+http_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(10, connect=3),
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=32, max_connections=64)
+)
 
-# --- FACEBOOK / INSTAGRAM CONFIGURATION ---
-FB_APP_ID = os.getenv("FACEBOOK_APP_ID")
-FB_APP_SECRET = os.getenv("FACEBOOK_APP_SECRET")
-FB_REDIRECT_URI = f"{BASE_URL}/api/v1/oauth/callback/facebook"
+# Caps concurrent Graph API calls across callbacks so a slow Facebook doesn't pile up requests
+_GRAPH_SEM = asyncio.Semaphore(5)
 
+# Transient statuses worth retrying on token endpoints (4xx means the code itself was rejected)
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
 
-@router.get("/login/{platform}/{client_id}")
-def login(platform: str, client_id: int, db: Session = Depends(get_db)):
+
+async def _post_with_backoff(url: str, retries: int = 3, **kwargs) -> httpx.Response:
     """
-    Initializes the OAuth flow for the requested platform.
+    POSTs with exponential backoff + jitter on 429/5xx and network errors.
+    Returns the last response once the attempts are exhausted.
     """
+    for attempt in range(1, retries + 1):
+        try:
+            response = await http_client.post(url, **kwargs)
+            if response.status_code not in RETRYABLE_STATUS_CODES or attempt == retries:
+                return response
+            logger.warning("⚠️ %s answered %s. Attempt %s/%s...", url, response.status_code, attempt, retries)
+        except httpx.TransportError as e:
+            if attempt == retries:
+                raise
+            logger.warning("⚠️ Network error on %s: %s. Attempt %s/%s...", url, e, attempt, retries)
 
-    platform = platform.lower()
+        await asyncio.sleep(min(2 ** attempt, 8) + random.uniform(0, 0.5))
 
-    logger.info(f"🟢 Initializing {platform.upper()} login for client: {client_id}")
-    state_payload = f"client_id_{client_id}"
 
-    if platform == "youtube":
-        redirect_uri = f"{BASE_URL}/api/v1/oauth/callback/youtube"
-        flow = Flow.from_client_secrets_file(
-            CLIENT_SECRETS_FILE,
-            scopes=YOUTUBE_SCOPES,
-            redirect_uri=redirect_uri
-        )
-        authorization_url, _ = flow.authorization_url(
-            access_type='offline',
-            include_granted_scopes='true',
-            prompt='consent',
-            state=state_payload
-        )
-        return RedirectResponse(authorization_url)
-
-    elif platform == "tiktok":
-        # ✨ REMOVED TOKEN DELETION HACK TO ALLOW MULTI-ACCOUNT SUPPORT
-        redirect_uri = f"{BASE_URL}/api/v1/oauth/callback/tiktok"
-        # Scopes: user.info.basic is needed for identity, video.publish for uploading
-        scopes = "user.info.basic,user.info.profile,user.info.stats,video.publish,video.upload,video.list"
-
-        params = {
-            "client_key": TIKTOK_CLIENT_ID,
-            "response_type": "code",
-            "scope": scopes,
-            "redirect_uri": redirect_uri,
-            "state": state_payload
-        }
-        auth_url = f"https://www.tiktok.com/v2/auth/authorize/?{urllib.parse.urlencode(params)}"
-        logger.info(f"🚀 Redirecting to TikTok: {auth_url}")
-        return RedirectResponse(auth_url)
-
-    elif platform == "instagram":
-        redirect_uri = f"{BASE_URL}/api/v1/oauth/callback/instagram"
-        # Scopes required for Reels publishing and account management
-        scopes = "instagram_basic,instagram_content_publish,pages_read_engagement,pages_show_list,public_profile"
-
-        params = {
-            "client_id": FB_APP_ID,
-            "redirect_uri": redirect_uri,
-            "scope": scopes,
-            "state": state_payload,
-            "response_type": "code"
-        }
-        auth_url = f"https://www.facebook.com/v22.0/dialog/oauth?{urllib.parse.urlencode(params)}"
-        logger.info(f"🚀 Redirecting to Facebook/Instagram: {auth_url}")
-        return RedirectResponse(auth_url)
+async def _graph_get(url: str, **kwargs) -> dict:
+    """
+    GET against the Graph API, bounded by _GRAPH_SEM.
+    """
+    async with _GRAPH_SEM:
+        return (await http_client.get(url, **kwargs)).json()
+
+
+# --- PRECOMPUTED AUTHORIZATION URL PREFIXES ---
+# Everything except the per-request 'state' is constant, so the query string is encoded once.
+# TikTok scopes: user.info.basic is needed for identity, video.publish for uploading
+TIKTOK_SCOPES = "user.info.basic,user.info.profile,user.info.stats,video.publish,video.upload,video.list"
+# Instagram scopes required for Reels publishing and account management
+INSTAGRAM_SCOPES = "instagram_basic,instagram_content_publish,pages_read_engagement,pages_show_list,public_profile"
+# Facebook Page whose Instagram account is selected by default when several are linked
+_DEFAULT_PAGE_NAME = SETTINGS.instagram_default_page
+
+_TIKTOK_AUTH_PREFIX = "https://www.tiktok.com/v2/auth/authorize/?" + urllib.parse.urlencode({
+    "client_key": SETTINGS.tiktok_client_id,
+    "response_type": "code",
+    "scope": TIKTOK_SCOPES,
+    "redirect_uri": _REDIRECT_URIS["tiktok"]
+})
+
+_META_AUTH_PREFIX_IG = "https://www.facebook.com/v22.0/dialog/oauth?" + urllib.parse.urlencode({
+    "client_id": SETTINGS.meta_app_id,
+    "redirect_uri": _REDIRECT_URIS["instagram"],
+    "scope": INSTAGRAM_SCOPES,
+    "response_type": "code"
+})
+
+
+# --- AUTHORIZATION URL BUILDERS ---
+@lru_cache(maxsize=8)
+def _yt_flow(redirect_uri: str) -> Flow:
+    """
+    Builds the YouTube Flow once per redirect URI and reuses it across logins.
+    Safe to share: it only renders authorization URLs (the code exchange goes through httpx)
+    and the per-request state is passed explicitly on each call.
+    """
+    # PKCE is disabled because the callback exchanges the code directly (no shared verifier)
+    return Flow.from_client_config(
+        load_youtube_client_secrets(),
+        scopes=YOUTUBE_SCOPES,
+        redirect_uri=redirect_uri,
+        autogenerate_code_verifier=False
+    )
 
-    raise HTTPException(status_code=400, detail=f"Platform {platform} is not supported.")
 
+def _youtube_auth_url(state_payload: str) -> str:
+    authorization_url, _ = _yt_flow(_REDIRECT_URIS["youtube"]).authorization_url(
+        access_type='offline',
+        include_granted_scopes='true',
+        prompt='consent',
+        state=state_payload
+    )
+    return authorization_url
 
-@router.get("/user/profile/{client_id}")
-def get_user_profile(client_id: int, db: Session = Depends(get_db)):
+
+def _tiktok_auth_url(state_payload: str) -> str:
+    # ✨ REMOVED TOKEN DELETION HACK TO ALLOW MULTI-ACCOUNT SUPPORT
+    return f"{_TIKTOK_AUTH_PREFIX}&state={urllib.parse.quote(state_payload)}"
+
+
+def _instagram_auth_url(state_payload: str) -> str:
+    return f"{_META_AUTH_PREFIX_IG}&state={urllib.parse.quote(state_payload)}"
+
+
+# --- TOKEN EXCHANGES (code -> token_data, always including 'account_id') ---
+def _token_payload(response: httpx.Response, provider_name: str) -> dict:
     """
-    Retrieves linked accounts information for the dashboard UI.
+    Parses a token endpoint reply. Non-2xx statuses and non-JSON bodies (e.g. an HTML 502 page)
+    raise the same 400 as a rejected code instead of escaping as a bare 500.
     """
-    creds = db.query(SocialCredential).filter_by(client_id=client_id).all()
+    payload = None
+    if response.is_success:
+        try:
+            payload = response.json()
+        except ValueError:
+            pass
+    if not isinstance(payload, dict) or "access_token" not in payload:
+        logger.error("❌ %s Token Exchange failed (%s): %s", provider_name, response.status_code, response.text[:500])
+        raise HTTPException(status_code=400, detail=f"Could not retrieve {provider_name} tokens")
+    return payload
+
+
+async def _exchange_youtube(code: str) -> dict:
+    # Exchange the code directly against Google's token endpoint (Flow.fetch_token blocks)
+    client_config = load_youtube_client_config()
+    token_uri = client_config["token_uri"]
+    response = await _post_with_backoff(
+        token_uri,
+        data={
+            "code": code,
+            "client_id": client_config["client_id"],
+            "client_secret": client_config["client_secret"],
+            "redirect_uri": _REDIRECT_URIS["youtube"],
+            "grant_type": "authorization_code",
+        }
+    )
+
+    google_tokens = _token_payload(response, "YouTube")
+
+    account_id = client_config["client_id"] or "youtube_default"  # ✨ Added account_id
+    # Naive UTC expiry (google-auth convention) lets the scheduler refresh tokens before they lapse
+    expiry = datetime.utcnow() + timedelta(seconds=google_tokens.get("expires_in", 3600))
+    return {
+        "token": google_tokens["access_token"],
+        "refresh_token": google_tokens.get("refresh_token"),
+        "token_uri": token_uri,
+        "client_id": client_config["client_id"],
+        "scopes": YOUTUBE_SCOPES,
+        "expiry": expiry.isoformat(),
+        "account_id": account_id
+    }
 
-    profiles = {}
-    accounts_list = []  # ✨ NEW ARRAY FOR THE MULTI-ACCOUNT FRONTEND
 
-    for c in creds:
-        # Extract display name from stored token_data
-        # TikTok stores it in 'user_info', Instagram in 'page_name', etc.
-        user_display = "Connected"
+async def _exchange_tiktok(code: str) -> dict:
+    # We must perform a POST request to exchange the code for the access_token
+    logger.info("Exchanging code for TikTok access_token")
+    response = await _post_with_backoff(
+        "https://open.tiktokapis.com/v2/oauth/token/",
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+        data={
+            "client_key": SETTINGS.tiktok_client_id,
+            "client_secret": SETTINGS.tiktok_client_secret,
+            "code": code,
+            "grant_type": "authorization_code",
+            "redirect_uri": _REDIRECT_URIS["tiktok"],
+        }
+    )
 
-        if c.platform == "tiktok":
-            user_info = c.token_data.get("user_info", {})
+    token_data = _token_payload(response, "TikTok")
 
-            inner_user = user_info.get("user", {}) if isinstance(user_info.get("user"), dict) else user_info
+    # --- Fetch Real TikTok User Info ---
+    try:
+        user_info_url = "https://open.tiktokapis.com/v2/user/info/?fields=display_name,username,avatar_url,open_id"
+        user_res = (await http_client.get(
+            user_info_url,
+            headers={"Authorization": f"Bearer {token_data['access_token']}"}
+        )).json()
+
+        logger.info("👤 user_res identified: %s", user_res)
+
+        u_data = user_res.get("data", {}).get("user", {})
+
+        display_name = u_data.get("display_name") or u_data.get("username") or "TikTok Account"
+        account_id = u_data.get("open_id") or display_name  # ✨ Extract unique ID
+
+        token_data["display_name"] = display_name
+        token_data["account_id"] = account_id  # ✨ Save in the token data
+        logger.info("👤 TikTok User identified: %s (%s)", display_name, account_id)
+    except Exception as e:
+        logger.error("⚠️ Could not fetch TikTok user info: %s", e)
+        token_data["display_name"] = "TikTok User"
+        token_data["account_id"] = "unknown_tiktok"
+
+    return token_data
+
+
+async def _exchange_instagram(code: str) -> dict:
+    # 1. Exchange short-lived code for access token
+    token_url = "https://graph.facebook.com/v19.0/oauth/access_token"
+    params = {
+        "client_id": SETTINGS.meta_app_id,
+        "client_secret": SETTINGS.meta_app_secret,
+        "redirect_uri": _REDIRECT_URIS["instagram"],
+        "code": code
+    }
+    res = await _graph_get(token_url, params=params)
+    short_token = res.get("access_token")
+
+    # 2. Exchange for Long-Lived Token
+    ll_params = {
+        "grant_type": "fb_exchange_token",
+        "client_id": SETTINGS.meta_app_id,
+        "client_secret": SETTINGS.meta_app_secret,
+        "fb_exchange_token": short_token
+    }
+    ll_res = await _graph_get(token_url, params=ll_params)
+    long_token = ll_res.get("access_token")
+
+    # 3. Discover Instagram Business Accounts
+    # Nested field expansion returns each page's linked IG account in the same call (no per-page probes)
+    pages_res = await _graph_get(
+        "https://graph.facebook.com/v19.0/me/accounts",
+        params={"fields": "id,name,instagram_business_account{id}", "access_token": long_token}
+    )
+
+    accounts_list = [
+        {"ig_id": page["instagram_business_account"]["id"], "page_name": page["name"], "page_id": page["id"]}
+        for page in pages_res.get("data", [])
+        if "instagram_business_account" in page
+    ]
+
+    # Prefer the configured default page, otherwise fall back to the first linked account
+    ig_by_page_name = {a["page_name"]: a["ig_id"] for a in accounts_list}
+    selected_account_id = ig_by_page_name.get(_DEFAULT_PAGE_NAME) or (accounts_list[0]["ig_id"] if accounts_list else None)
+
+    account_id = selected_account_id  # ✨ Assign unique ID for IG
+
+    return {
+        "access_token": long_token,
+        "instagram_account_id": selected_account_id,
+        "available_accounts": accounts_list,
+        "token_type": "bearer",
+        "account_id": account_id  # ✨ Save in the token data
+    }
 
-            user_display = (
-                    c.token_data.get("display_name") or
-                    inner_user.get("display_name") or
-                    inner_user.get("username") or
-                    c.token_data.get("username") or
-                    "TikTok User"
-            )
 
-        elif c.platform == "instagram":
-            user_display = c.token_data.get("page_name") or "IG Business"
-        elif c.platform == "youtube":
-            user_display = "YouTube Channel"
-
-        # ✨ STRUCTURE FOR LOVABLE (Supports multiple accounts of the same platform)
-        accounts_list.append({
-            "credential_id": c.id,
-            "platform": c.platform,
-            "username": user_display,
-            "account_id": c.token_data.get("account_id"),
-            "updated_at": c.updated_at.strftime("%Y-%m-%d %H:%M")
-        })
-
-        # ✨ LEGACY STRUCTURE (Keeps your current HTML working seamlessly)
-        profiles[c.platform.lower()] = {
-            "connected": True,
-            "username": user_display,
-            "updated_at": c.updated_at.strftime("%Y-%m-%d")
-        }
+@dataclass(frozen=True)
+class ProviderSpec:
+    """OAuth entry points for one platform."""
+    build_auth_url: Callable[[str], str]
+    exchange_token: Callable[[str], Awaitable[dict]]
+
+
+# --- PROVIDER REGISTRY (single dispatch point for login and callback) ---
+PROVIDERS: dict[str, ProviderSpec] = {
+    "youtube": ProviderSpec(build_auth_url=_youtube_auth_url, exchange_token=_exchange_youtube),
+    "tiktok": ProviderSpec(build_auth_url=_tiktok_auth_url, exchange_token=_exchange_tiktok),
+    "instagram": ProviderSpec(build_auth_url=_instagram_auth_url, exchange_token=_exchange_instagram),
+}
+
+
+# --- SUCCESS PAGE ---
+# Platform-specific styles and icons for the "account linked" card (read-only)
+PLATFORM_META = MappingProxyType({
+    "youtube": {
+        "color": "#FF0000",
+        "icon": "https://cdn-icons-png.flaticon.com/512/1384/1384060.png",
+        "label": "YouTube"
+    },
+    "tiktok": {
+        "color": "#00f2ea",  # TikTok Cyan/Red mix effect
+        "icon": "https://cdn-icons-png.flaticon.com/512/3046/3046121.png",
+        "label": "TikTok"
+    },
+    "instagram": {
+        "color": "#E1306C",
+        "icon": "https://cdn-icons-png.flaticon.com/512/174/174855.png",
+        "label": "Instagram"
+    }
+})
+
+_SUCCESS_TEMPLATE = string.Template("""
+    <html>
+        <head>
+            <title>$label Connected | EVO Omni</title>
+            <style>
+                body { 
+                    font-family: 'Inter', -apple-system, sans-serif; 
+                    display: flex; 
+                    align-items: center; 
+                    justify-content: center; 
+                    height: 100vh; 
+                    background: #0f172a; 
+                    color: white; 
+                    margin: 0;
+                }
+                .card { 
+                    background: #1e293b; 
+                    padding: 60px; 
+                    border-radius: 24px; 
+                    box-shadow: 0 20px 50px rgba(0,0,0,0.5); 
+                    border: 1px solid #334155; 
+                    max-width: 400px;
+                    width: 90%;
+                    position: relative;
+                    overflow: hidden;
+                }
+                .card::before {
+                    content: "";
+                    position: absolute;
+                    top: 0; left: 0; width: 100%; height: 5px;
+                    background: $color;
+                }
+                .logo-container {
+                    width: 80px;
+                    height: 80px;
+                    background: #0f172a;
+                    border-radius: 20px;
+                    display: flex;
+                    align-items: center;
+                    justify-content: center;
+                    margin: 0 auto 25px;
+                    border: 2px solid #334155;
+                }
+                .logo-container img {
+                    width: 45px;
+                    height: 45px;
+                    object-fit: contain;
+                }
+                h1 { 
+                    font-size: 24px;
+                    margin-bottom: 10px; 
+                    color: white;
+                }
+                p { 
+                    color: #94a3b8; 
+                    font-size: 16px; 
+                    line-height: 1.5;
+                    margin-bottom: 30px;
+                }
+                .platform-badge {
+                    display: inline-block;
+                    padding: 5px 15px;
+                    border-radius: 20px;
+                    background: ${color}33; /* 20% opacity */
+                    color: $color;
+                    font-weight: bold;
+                    font-size: 14px;
+                    text-transform: uppercase;
+                    letter-spacing: 1px;
+                }
+                .footer-text {
+                    font-size: 13px;
+                    opacity: 0.6;
+                    margin-top: 20px;
+                }
+            </style>
+        </head>
+        <body>
+            <div class="card">
+                <div class="logo-container">
+                    <img src="$icon" alt="$label">
+                </div>
+                <div class="platform-badge">$label</div>
+                <h1>Success!</h1>
+                <p>Your <strong>$label</strong> account has been securely linked to the <strong>EVO Omni Publisher</strong>.</p>
+                <div class="footer-text">You can safely close this tab now.</div>
+            </div>
+        </body>
+    </html>
+""")
+
+# Rendered once at import; the callback only picks the platform's bytes
+_SUCCESS_PAGES = {p: _SUCCESS_TEMPLATE.substitute(**meta).encode("utf-8") for p, meta in PLATFORM_META.items()}
+# Pre-compressed copies for browsers that accept gzip (compression cost paid once, at import)
+_SUCCESS_PAGES_GZIP = {p: gzip.compress(body, 9) for p, body in _SUCCESS_PAGES.items()}
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """
+    True if Accept-Encoding allows gzip with a non-zero q-value ('gzip;q=0' is a refusal).
+    An explicit gzip entry wins over a '*' wildcard.
+    """
+    wildcard = False
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if coding not in ("gzip", "*"):
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding == "gzip":
+            return q > 0
+        wildcard = q > 0
+    return wildcard
+
+
+def _build_auth_url(platform: str, client_id: int) -> str:
+    """
+    Returns the provider authorization URL for a client, reusing a recently built one.
+    """
+    key = (platform, client_id)
+    cached = _auth_url_cache.get(key)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
 
-    return {"profiles": profiles, "accounts": accounts_list}
+    auth_url = PROVIDERS[platform].build_auth_url(_SIGNER.dumps({"cid": client_id}))
+    if len(_auth_url_cache) >= AUTH_URL_CACHE_MAX_SIZE:
+        _auth_url_cache.clear()
+    _auth_url_cache[key] = (auth_url, time.monotonic() + AUTH_URL_CACHE_TTL)
+    return auth_url
 
 
-@router.get("/callback/{platform}")
-def callback(platform: str, request: Request, db: Session = Depends(get_db)):
+@router.get("/login/{platform}/{client_id}")
+def login(platform: str, client_id: int):
     """
-    Handles the redirect from the provider and exchanges the code for real tokens.
+    Initializes the OAuth flow for the requested platform.
     """
-    logger.info(f"🟢 Callback received for {platform.upper()}")
 
-    code = request.query_params.get("code")
-    state = request.query_params.get("state")
-    error = request.query_params.get("error")
+    platform = platform.lower()
+    if platform not in _ALLOWED_PLATFORMS:
+        raise HTTPException(status_code=400, detail=f"Platform {platform} is not supported.")
+
+    logger.info("🟢 Initializing %s login for client: %s", platform, client_id)
+    auth_url = _build_auth_url(platform, client_id)
+    logger.info("🚀 Redirecting to %s: %s", platform, auth_url)
+    return RedirectResponse(auth_url)
+
+
+# Dashboard projection: one row per linked account with the display name resolved in SQL
+_PROFILE_QUERY = text("""
+    WITH creds AS (
+        SELECT
+            id, platform, token_data, updated_at,
+            CASE WHEN jsonb_typeof(token_data -> 'user_info' -> 'user') = 'object'
+                 THEN token_data -> 'user_info' -> 'user'
+                 ELSE token_data -> 'user_info'
+            END AS inner_user
+        FROM social_credentials
+        WHERE client_id = :client_id
+    )
+    SELECT
+        id,
+        platform,
+        token_data ->> 'account_id' AS account_id,
+        updated_at,
+        CASE platform
+            WHEN 'tiktok' THEN COALESCE(
+                NULLIF(token_data ->> 'display_name', ''),
+                NULLIF(inner_user ->> 'display_name', ''),
+                NULLIF(inner_user ->> 'username', ''),
+                NULLIF(token_data ->> 'username', ''),
+                'TikTok User'
+            )
+            WHEN 'instagram' THEN COALESCE(NULLIF(token_data ->> 'page_name', ''), 'IG Business')
+            WHEN 'youtube' THEN 'YouTube Channel'
+            ELSE 'Connected'
+        END AS username
+    FROM creds
+""")
 
-    if error:
-        logger.error(f"❌ {platform.upper()} Error: {error}")
-        raise HTTPException(status_code=400, detail=f"OAuth Error: {error}")
 
-    if not code:
-        raise HTTPException(status_code=400, detail="Authorization code missing")
+@router.get("/user/profile/{client_id}")
+def get_user_profile(client_id: int, db: Session = Depends(get_db)):
+    """
+    Retrieves linked accounts information for the dashboard UI.
+    """
+    # Display names are extracted by Postgres (JSONB operators) so only the needed columns come back.
+    # TikTok stores it in 'user_info' (optionally nested under 'user'), Instagram in 'page_name', etc.
+    rows = db.execute(_PROFILE_QUERY, {"client_id": client_id}).all()
+
+    # ✨ STRUCTURE FOR LOVABLE (Supports multiple accounts of the same platform)
+    accounts_list = [
+        {
+            "credential_id": r.id,
+            "platform": r.platform,
+            "username": r.username,
+            "account_id": r.account_id,
+            "updated_at": r.updated_at.strftime("%Y-%m-%d %H:%M")
+        }
+        for r in rows
+    ]
 
-    # ADJUSTMENT 1: Safe parsing for state "client_id_1" (changed from [2] to [-1])
-    try:
-        client_id = int(state.split("_")[-1])
-    except Exception:
-        client_id = 1
-
-    token_data = {}
-    account_id = None  # ✨ Unique social network identifier
-
-    # --- YOUTUBE TOKEN EXCHANGE (Flow based) ---
-    if platform == "youtube":
-        redirect_uri = f"{BASE_URL}/api/v1/oauth/callback/youtube"
-        flow = Flow.from_client_secrets_file(
-            CLIENT_SECRETS_FILE,
-            scopes=YOUTUBE_SCOPES,
-            redirect_uri=redirect_uri
-        )
-        flow.fetch_token(code=code)
-        credentials = flow.credentials
-        account_id = credentials.client_id or "youtube_default"  # ✨ Added account_id
-        token_data = {
-            "token": credentials.token,
-            "refresh_token": credentials.refresh_token,
-            "token_uri": credentials.token_uri,
-            "client_id": credentials.client_id,
-            "account_id": account_id
+    # ✨ LEGACY STRUCTURE (Keeps your current HTML working seamlessly)
+    profiles = {
+        r.platform.lower(): {
+            "connected": True,
+            "username": r.username,
+            "updated_at": r.updated_at.strftime("%Y-%m-%d")
         }
+        for r in rows
+    }
 
-    # --- TIKTOK TOKEN EXCHANGE (Request based) ---
-    elif platform == "tiktok":
-        redirect_uri = f"{BASE_URL}/api/v1/oauth/callback/tiktok"
-
-        # We must perform a POST request to exchange the code for the access_token
-        logger.info(f"Exchanging code for TikTok access_token for client {client_id}")
-        response = requests.post(
-            "https://open.tiktokapis.com/v2/oauth/token/",
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-            data={
-                "client_key": TIKTOK_CLIENT_ID,
-                "client_secret": TIKTOK_CLIENT_SECRET,
-                "code": code,
-                "grant_type": "authorization_code",
-                "redirect_uri": redirect_uri,
-            }
-        )
+    return {"profiles": profiles, "accounts": accounts_list}
 
-        token_data = response.json()
 
-        if response.status_code != 200 or "access_token" not in token_data:
-            logger.error(f"❌ TikTok Token Exchange failed: {token_data}")
-            raise HTTPException(status_code=400, detail="Could not retrieve TikTok tokens")
+async def _persist_credential(client_id: int, platform: str, token_data: dict):
+    """
+    Stores the linked account tokens using its own short-lived session.
+    Raises a 503 when the write fails, so the user is never shown a success page for a lost token.
+    """
+    account_id = token_data.get("account_id")
+    async with AsyncSessionLocal() as db:
+        try:
+            # Single round-trip upsert keyed by (client_id, platform, account_id)
+            stmt = pg_insert(SocialCredential).values(
+                client_id=client_id,
+                platform=platform,
+                token_data=token_data
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[SocialCredential.client_id, SocialCredential.platform, CREDENTIAL_ACCOUNT_KEY],
+                set_={"token_data": stmt.excluded.token_data, "updated_at": stmt.excluded.updated_at},
+                # Identical payloads (repeat callbacks) skip the UPDATE and its JSONB rewrite entirely
+                where=SocialCredential.token_data.is_distinct_from(stmt.excluded.token_data)
+            )
+            result = await db.execute(stmt)
+
+            if result.rowcount:
+                await db.commit()
+                logger.info("💾 Upserted %s credentials for Account %s", platform, account_id)
+            else:
+                logger.debug("Token unchanged for %s Account %s, skipping UPDATE", platform, account_id)
+            logger.info("🎉 %s linking process complete.", platform)
+        except Exception as e:
+            await db.rollback()
+            logger.error("❌ Could not persist %s credentials for client %s: %s", platform, client_id, e)
+            raise HTTPException(status_code=503, detail="Could not save the linked account. Please try again.")
 
-        # --- Fetch Real TikTok User Info ---
 
-        try:
-            user_info_url = "https://open.tiktokapis.com/v2/user/info/?fields=display_name,username,avatar_url,open_id"
-            user_res = requests.get(
-                user_info_url,
-                headers={"Authorization": f"Bearer {token_data['access_token']}"}
-            ).json()
+async def _exchange_and_persist(provider, client_id: int, platform: str, code: str) -> dict:
+    """
+    Shared by every callback carrying this code: exchanges it once and stores the tokens.
+    Runs as its own task, so the write doesn't depend on any one request surviving.
+    """
+    token_data = await provider.exchange_token(code)
+    await _persist_credential(client_id, platform, token_data)
+    return token_data
 
-            logger.info(f"👤 user_res identified: {user_res}")
 
-            u_data = user_res.get("data", {}).get("user", {})
+@router.get("/callback/{platform}")
+async def callback(platform: str, request: Request):
+    """
+    Handles the redirect from the provider and exchanges the code for real tokens.
+    """
+    logger.info("🟢 Callback received for %s", platform)
 
-            display_name = u_data.get("display_name") or u_data.get("username") or "TikTok Account"
-            account_id = u_data.get("open_id") or display_name  # ✨ Extract unique ID
+    # Parse the query string once; user-cancel paths bail out before any provider work
+    qp = request.query_params
+    error = qp.get("error")
+    if error:
+        logger.error("❌ %s Error: %s", platform, error)
+        raise HTTPException(status_code=400, detail=f"OAuth Error: {error}")
 
-            token_data["display_name"] = display_name
-            token_data["account_id"] = account_id  # ✨ Save in the token data
-            logger.info(f"👤 TikTok User identified: {display_name} ({account_id})")
-        except Exception as e:
-            logger.error(f"⚠️ Could not fetch TikTok user info: {str(e)}")
-            account_id = "unknown_tiktok"
-            token_data["display_name"] = "TikTok User"
-            token_data["account_id"] = account_id
-
-    # --- INSTAGRAM EXCHANGE (Request based) ---
-    elif platform == "instagram":
-        # 1. Exchange short-lived code for access token
-        token_url = "https://graph.facebook.com/v19.0/oauth/access_token"
-        params = {
-            "client_id": os.getenv("FACEBOOK_APP_ID"),
-            "client_secret": os.getenv("FACEBOOK_APP_SECRET"),
-            "redirect_uri": f"{BASE_URL}/api/v1/oauth/callback/instagram",
-            "code": code
-        }
-        res = requests.get(token_url, params=params).json()
-        short_token = res.get("access_token")
-
-        # 2. Exchange for Long-Lived Token
-        ll_params = {
-            "grant_type": "fb_exchange_token",
-            "client_id": os.getenv("FACEBOOK_APP_ID"),
-            "client_secret": os.getenv("FACEBOOK_APP_SECRET"),
-            "fb_exchange_token": short_token
-        }
-        ll_res = requests.get(token_url, params=ll_params).json()
-        long_token = ll_res.get("access_token")
-
-        # 3. Discover Instagram Business Account
-        # Fetch pages linked to the user
-        pages_res = requests.get(
-            f"https://graph.facebook.com/v19.0/me/accounts?access_token={long_token}"
-        ).json()
-
-        accounts_list = []
-        selected_account_id = None
-
-        if "data" in pages_res:
-            for page in pages_res["data"]:
-                page_id = page["id"]
-                page_name = page["name"]
-
-                ig_info = requests.get(
-                    f"https://graph.facebook.com/v19.0/{page_id}?fields=instagram_business_account&access_token={long_token}"
-                ).json()
-
-                if "instagram_business_account" in ig_info:
-                    ig_id = ig_info["instagram_business_account"]["id"]
-                    account_entry = {"ig_id": ig_id, "page_name": page_name, "page_id": page_id}
-                    accounts_list.append(account_entry)
-
-                    if page_name == 'El origen del todo':
-                        selected_account_id = ig_id
-
-        if not selected_account_id and accounts_list:
-            selected_account_id = accounts_list[0]['ig_id']
-
-        account_id = selected_account_id  # ✨ Assign unique ID for IG
-
-        token_data = {
-            "access_token": long_token,
-            "instagram_account_id": selected_account_id,
-            "available_accounts": accounts_list,
-            "token_type": "bearer",
-            "account_id": account_id  # ✨ Save in the token data
-        }
+    code = qp.get("code")
+    state = qp.get("state")
 
-    # --- ✨ DATABASE PERSISTENCE (MULTI-ACCOUNT LOGIC) ---
-    all_client_creds = db.query(SocialCredential).filter_by(
-        client_id=client_id, platform=platform
-    ).all()
-
-    # Check if THIS specific account is already registered
-    existing_cred = None
-    for cred in all_client_creds:
-        if cred.token_data.get("account_id") == account_id:
-            existing_cred = cred
-            break
-
-    if existing_cred:
-        existing_cred.token_data = token_data
-        logger.info(f"💾 Updated {platform.upper()} credentials for Account {account_id}")
-    else:
-        new_cred = SocialCredential(
-            client_id=client_id,
-            platform=platform,
-            token_data=token_data
-        )
-        db.add(new_cred)
-        logger.info(f"💾 Saved NEW {platform.upper()} credentials for Account {account_id}")
-
-    db.commit()
-    logger.info(f"🎉 {platform.upper()} linking process complete.")
-
-    # 1. Define platform-specific styles and icons
-    platform_meta = {
-        "youtube": {
-            "color": "#FF0000",
-            "icon": "https://cdn-icons-png.flaticon.com/512/1384/1384060.png",
-            "label": "YouTube"
-        },
-        "tiktok": {
-            "color": "#00f2ea",  # TikTok Cyan/Red mix effect
-            "icon": "https://cdn-icons-png.flaticon.com/512/3046/3046121.png",
-            "label": "TikTok"
-        },
-        "instagram": {
-            "color": "#E1306C",
-            "icon": "https://cdn-icons-png.flaticon.com/512/174/174855.png",
-            "label": "Instagram"
-        }
-    }
+    if not code:
+        raise HTTPException(status_code=400, detail="Authorization code missing")
 
-    # Get current platform metadata (default to generic if not found)
-    meta = platform_meta.get(platform.lower(), {
-        "color": "#22c55e",
-        "icon": "✅",
-        "label": platform.capitalize()
-    })
+    # Verify the signed state before any provider or DB work (expired/tampered -> 400)
+    try:
+        client_id = _SIGNER.loads(state, max_age=_STATE_MAX_AGE)["cid"]
+    except (BadSignature, TypeError, KeyError):
+        logger.warning("⚠️ Invalid or expired OAuth state for %s", platform)
+        raise HTTPException(status_code=400, detail="Invalid or expired OAuth state")
+
+    provider = PROVIDERS.get(platform)
+    if not provider:
+        raise HTTPException(status_code=400, detail=f"Platform {platform} is not supported.")
+
+    # --- ✨ TOKEN EXCHANGE + DATABASE PERSISTENCE (MULTI-ACCOUNT LOGIC) ---
+    # Replayed callbacks for the same code (double redirects, refreshes) share one exchange;
+    # different accounts of the same client/platform each get their own
+    key = (client_id, platform, code)
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_exchange_and_persist(provider, client_id, platform, code))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+
+    # Shielded so a disconnecting browser doesn't cancel the exchange other callers are awaiting.
+    # Exchange (400) and persistence (503) failures surface here instead of the success page
+    await asyncio.shield(task)
 
     # Final response (Keep your nice success card or redirect)
     if platform == "tiktok":
         return RedirectResponse(url="/dashboard.html")
 
-    return HTMLResponse(content=f"""
-        <html>
-            <head>
-                <title>{meta['label']} Connected | EVO Omni</title>
-                <style>
-                    body {{ 
-                        font-family: 'Inter', -apple-system, sans-serif; 
-                        display: flex; 
-                        align-items: center; 
-                        justify-content: center; 
-                        height: 100vh; 
-                        background: #0f172a; 
-                        color: white; 
-                        margin: 0;
-                    }}
-                    .card {{ 
-                        background: #1e293b; 
-                        padding: 60px; 
-                        border-radius: 24px; 
-                        box-shadow: 0 20px 50px rgba(0,0,0,0.5); 
-                        border: 1px solid #334155; 
-                        max-width: 400px;
-                        width: 90%;
-                        position: relative;
-                        overflow: hidden;
-                    }}
-                    .card::before {{
-                        content: "";
-                        position: absolute;
-                        top: 0; left: 0; width: 100%; height: 5px;
-                        background: {meta['color']};
-                    }}
-                    .logo-container {{
-                        width: 80px;
-                        height: 80px;
-                        background: #0f172a;
-                        border-radius: 20px;
-                        display: flex;
-                        align-items: center;
-                        justify-content: center;
-                        margin: 0 auto 25px;
-                        border: 2px solid #334155;
-                    }}
-                    .logo-container img {{
-                        width: 45px;
-                        height: 45px;
-                        object-fit: contain;
-                    }}
-                    h1 {{ 
-                        font-size: 24px;
-                        margin-bottom: 10px; 
-                        color: white;
-                    }}
-                    p {{ 
-                        color: #94a3b8; 
-                        font-size: 16px; 
-                        line-height: 1.5;
-                        margin-bottom: 30px;
-                    }}
-                    .platform-badge {{
-                        display: inline-block;
-                        padding: 5px 15px;
-                        border-radius: 20px;
-                        background: {meta['color']}33; /* 20% opacity */
-                        color: {meta['color']};
-                        font-weight: bold;
-                        font-size: 14px;
-                        text-transform: uppercase;
-                        letter-spacing: 1px;
-                    }}
-                    .footer-text {{
-                        font-size: 13px;
-                        opacity: 0.6;
-                        margin-top: 20px;
-                    }}
-                </style>
-            </head>
-            <body>
-                <div class="card">
-                    <div class="logo-container">
-                        <img src="{meta['icon']}" alt="{meta['label']}">
-                    </div>
-                    <div class="platform-badge">{meta['label']}</div>
-                    <h1>Success!</h1>
-                    <p>Your <strong>{meta['label']}</strong> account has been securely linked to the <strong>EVO Omni Publisher</strong>.</p>
-                    <div class="footer-text">You can safely close this tab now.</div>
-                </div>
-            </body>
-        </html>
-    """)
\ No newline at end of file
+    # Both variants carry Vary so shared caches never hand the gzip body to a client that refused it
+    if _accepts_gzip(request.headers.get("accept-encoding", "")):
+        return HTMLResponse(
+            content=_SUCCESS_PAGES_GZIP[platform],
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"}
+        )
+    return HTMLResponse(content=_SUCCESS_PAGES[platform], headers={"Vary": "Accept-Encoding"})
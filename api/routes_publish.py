@@ -1,26 +1,30 @@
 # api/routes_publish.py
-import logging
-import shutil
 import os
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
-from sqlalchemy import text
+import uuid
+import logging
+from pathlib import PurePosixPath
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form, BackgroundTasks, Query
+from sqlalchemy import text, tuple_, insert
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime, timezone
 import json
 from services.utils import get_smart_title
 
-from database.session import get_db
+from database.session import get_db, get_async_db, SessionLocal
 from database.models import ScheduledPost, Client
 
 # --- CRUCIAL: Importing your fixed storage service ---
-from storage.oracle_s3 import upload_video
+from storage.oracle_s3 import upload_video_stream
 
 logger = logging.getLogger("Publish-API")
 
 # Version Marker
 ROUTE_VERSION = "2.5.2-DEBUG"
+# Set PUBLISH_DEBUG=1 to print the request banner on every upload
+PUBLISH_DEBUG = os.getenv("PUBLISH_DEBUG") == "1"
 
 # --- 1. PYDANTIC SCHEMAS ---
 class PostCreate(BaseModel):
@@ -45,41 +49,110 @@ class PostResponse(BaseModel):
         from_attributes = True
 
 
+_MARK_UPLOADED = text("UPDATE scheduled_posts SET status = :status WHERE id = :post_id AND status = 'uploading'")
+
+
 # --- 2. ROUTER DEFINITION ---
 router = APIRouter(prefix="/api/v1/publish", tags=["Publishing Operations"])
 
 
 # --- 3. ORIGINAL ENDPOINTS (Kept intact) ---
 @router.post("/", response_model=PostResponse, status_code=status.HTTP_201_CREATED)
-def schedule_new_post(post_data: PostCreate, db: Session = Depends(get_db)):
-    client = db.query(Client).filter(Client.id == post_data.client_id).first()
+async def schedule_new_post(post_data: PostCreate, db: AsyncSession = Depends(get_async_db)):
+    client = await db.get(Client, post_data.client_id)
     if not client: raise HTTPException(status_code=404, detail="Client not found")
-    new_post = ScheduledPost(**post_data.dict(), status="pending")
-    db.add(new_post);
-    db.commit();
-    db.refresh(new_post)
+    new_post = (await db.execute(
+        insert(ScheduledPost).values(**post_data.model_dump(), status="pending").returning(ScheduledPost)
+    )).scalar_one()
+    await db.commit()
     return new_post
 
 
+@router.post("/bulk", response_model=List[PostResponse], status_code=status.HTTP_201_CREATED)
+def schedule_bulk_posts(posts: List[PostCreate], db: Session = Depends(get_db)):
+    """Schedules several posts in a single INSERT ... RETURNING round-trip."""
+    if not posts:
+        return []
+
+    client_ids = {p.client_id for p in posts}
+    found_ids = {row.id for row in db.query(Client.id).filter(Client.id.in_(client_ids))}
+    missing = client_ids - found_ids
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Client(s) not found: {sorted(missing)}")
+
+    stmt = insert(ScheduledPost).values(
+        [p.model_dump() | {"status": "pending"} for p in posts]
+    ).returning(
+        ScheduledPost.id, ScheduledPost.client_id, ScheduledPost.title, ScheduledPost.platforms,
+        ScheduledPost.scheduled_time, ScheduledPost.status, ScheduledPost.created_at
+    )
+    created = db.execute(stmt).all()
+    db.commit()
+    return created
+
+
 @router.get("/pending", response_model=List[PostResponse])
-def get_pending_posts(db: Session = Depends(get_db)):
-    return db.query(ScheduledPost).filter(ScheduledPost.status == "pending").all()
+def get_pending_posts(
+        cursor: Optional[datetime] = None,
+        cursor_id: int = 0,
+        limit: int = Query(50, ge=1, le=500),
+        db: Session = Depends(get_db)
+):
+    """
+    Keyset-paginated pending queue ordered by (scheduled_time, id).
+    Pass the last item's scheduled_time/id as cursor/cursor_id to get the next page.
+    """
+    query = db.query(
+        ScheduledPost.id, ScheduledPost.client_id, ScheduledPost.title, ScheduledPost.platforms,
+        ScheduledPost.scheduled_time, ScheduledPost.status, ScheduledPost.created_at
+    ).filter(ScheduledPost.status == "pending")
+
+    if cursor is not None:
+        query = query.filter(tuple_(ScheduledPost.scheduled_time, ScheduledPost.id) > (cursor, cursor_id))
+
+    return query.order_by(ScheduledPost.scheduled_time, ScheduledPost.id).limit(limit).all()
 
 
 # --- 4. THE WEB-DIRECT METHOD (The Fix) ---
-@router.post("/web-direct")
+def _sync_upload_to_oci(post_id: int, file_obj, object_name: str):
+    """
+    Background step of web-direct: streams the upload to OCI, then releases the post to the
+    scheduler ('uploading' -> 'pending'), or marks it 'failed' if the sync didn't succeed.
+    """
+    logger.info(f"☁️ [BG] STARTING OCI SYNC FOR {object_name} (Post {post_id})...")
+    success = upload_video_stream(file_obj, object_name)
+    new_status = "pending" if success else "failed"
+
+    db = SessionLocal()
+    try:
+        db.execute(_MARK_UPLOADED, {"status": new_status, "post_id": post_id})
+        db.commit()
+        if success:
+            logger.info(f"✅ [BG] Post {post_id} released to the scheduler.")
+        else:
+            logger.error(f"❌ [BG] OCI SYNC FAILED. Post {post_id} marked as failed.")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"🔥 [BG] Could not update Post {post_id} after OCI sync: {str(e)}")
+    finally:
+        db.close()
+
+
+@router.post("/web-direct", status_code=status.HTTP_202_ACCEPTED)
 async def publish_web_direct(
+        background_tasks: BackgroundTasks,
         file: UploadFile = File(...),
         privacy: str = Form(...),
         caption: str = Form(""),
         scheduled_time: str = Form(...),
         platforms_json: str = Form('["tiktok"]'),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    # HIGH VISIBILITY LOGS
-    logger.info("XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX")
-    logger.info(f"XXX INCOMING REQUEST: {file.filename} [VER: {ROUTE_VERSION}]")
-    logger.info("XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX")
+    # HIGH VISIBILITY LOGS (debug deployments only)
+    if PUBLISH_DEBUG:
+        logger.info("XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX")
+        logger.info(f"XXX INCOMING REQUEST: {file.filename} [VER: {ROUTE_VERSION}]")
+        logger.info("XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX")
 
     try:
 
@@ -103,52 +176,41 @@ async def publish_web_direct(
             logger.warning("⚠️ Error parseando platforms_json. Usando fallback default.")
             parsed_platforms = ["tiktok"]
 
-        # Step 1: VPS Local Buffer
-        temp_dir = "temp_media"
-        os.makedirs(temp_dir, exist_ok=True)
-        file_path = os.path.join(temp_dir, file.filename)
+        # Step 1: Rewind the spooled upload (no extra VPS buffer copy)
+        await file.seek(0)
+        # Client filenames are untrusted: keep only the base name and prefix a unique id
+        # so path tricks ("../x.mp4") and same-name uploads can't clobber other objects
+        object_name = f"{uuid.uuid4().hex}_{PurePosixPath(file.filename or 'video.mp4').name}"
+        logger.info(f"💾 [1/3] UPLOAD RECEIVED: {file.filename} -> {object_name}")
 
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        logger.info(f"💾 [1/3] VPS BUFFER SAVED: {file_path}")
-
-        # Step 2: ORACLE SYNC (The Critical Part)
-        logger.info(f"☁️ [2/3] STARTING OCI SYNC FOR {file.filename}...")
-        success = upload_video(file_path, file.filename)
-
-        if not success:
-            logger.error("❌ [2/3] OCI SYNC FAILED. DB INSERT CANCELLED.")
-            raise HTTPException(status_code=502, detail="Oracle Sync Failed")
-
-        # Step 3: Database Registration
-        logger.info("🗄️ [3/3] RECORDING TO POSTGRES...")
+        # Step 2: Database Registration ('uploading' keeps it away from the scheduler until OCI has the file)
+        logger.info("🗄️ [2/3] RECORDING TO POSTGRES...")
 
         # Extract smart title using the helper
         post_title = get_smart_title(caption)
         logger.info(f"✨ Smart Title generated: '{post_title}'")
 
-        insert_query = text("""
-            INSERT INTO scheduled_posts (
-                client_id, video_file_id, title, description, platforms, scheduled_time, status
-            )
-            VALUES (
-                1, :video_file_id, :title, :description, '["tiktok"]'::jsonb, :scheduled_time, 'pending'
-            )
-        """)
-
-        db.execute(insert_query, {
-            "video_file_id": file.filename,
-            "title": post_title,  # Short & Clean for the Dashboard
-            "description": caption,  # Full raw text for TikTok/Instagram
-            "scheduled_time": parsed_scheduled_time
-        })
-        db.commit()
-
-        logger.info(f"🚀 [FINISH] ALL STEPS DONE FOR {file.filename}")
-        return {"status": "success", "message": "Video uploaded and scheduled."}
+        stmt = insert(ScheduledPost).values(
+            client_id=1,
+            video_file_id=object_name,
+            title=post_title,  # Short & Clean for the Dashboard
+            description=caption,  # Full raw text for TikTok/Instagram
+            platforms=["tiktok"],
+            scheduled_time=parsed_scheduled_time,
+            status="uploading"
+        ).returning(ScheduledPost.id)
+        # INSERT ... RETURNING hands back the id (the NOTIFY trigger sees the same row) and commits on exit
+        async with db.begin():
+            post_id = (await db.execute(stmt)).scalar_one()
+
+        # Step 3: ORACLE SYNC, after the response is sent (the browser doesn't wait on the upload)
+        background_tasks.add_task(_sync_upload_to_oci, post_id, file.file, object_name)
+
+        logger.info(f"🚀 [FINISH] Post {post_id} queued, OCI sync running in background for {object_name}")
+        return {"status": "queued", "post_id": post_id, "message": "Video received. Upload to storage in progress."}
 
     except Exception as e:
-        if 'db' in locals(): db.rollback()
+        await db.rollback()
         logger.error(f"🔥 FATAL ERROR: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,148 @@
+# database/bootstrap.py
+import logging
+from sqlalchemy import text
+
+from database.session import engine, Base
+import database.models  # noqa: F401  (registers the tables on Base.metadata)
+
+logger = logging.getLogger("DB-Bootstrap")
+
+# Every table and index the models declare; checked in one round-trip at boot
+_SCHEMA_OBJECTS = [
+    name
+    for table in Base.metadata.sorted_tables
+    for name in [table.name, *(index.name for index in table.indexes)]
+]
+_MISSING_SCHEMA_OBJECTS = text(
+    "SELECT count(*) FROM unnest(CAST(:names AS text[])) AS n WHERE to_regclass(n) IS NULL"
+)
+
+# Serializes bootstrap across workers/containers (DDL from N workers at once would race)
+_BOOTSTRAP_LOCK_KEY = 9182735
+_LOCK = text("SELECT pg_advisory_lock(:key)")
+_UNLOCK = text("SELECT pg_advisory_unlock(:key)")
+
+# Rows that would collide on uq_social_credentials_account (one row per linked account);
+# the most recently updated row wins. Runs before the unique index is built on older databases.
+_DEDUPE_CREDENTIALS = text("""
+    DELETE FROM social_credentials
+    WHERE id IN (
+        SELECT id FROM (
+            SELECT id, row_number() OVER (
+                PARTITION BY client_id, platform, COALESCE(token_data ->> 'account_id', '')
+                ORDER BY updated_at DESC NULLS LAST, id DESC
+            ) AS rn
+            FROM social_credentials
+            WHERE client_id IS NOT NULL
+        ) ranked
+        WHERE rn > 1
+    )
+""")
+
+# Single-column status index superseded by the partial ix_scheduled_posts_status_time.
+# create_all never drops anything, so existing databases lose it here (only once the partial index exists)
+_DROP_LEGACY_STATUS_INDEX = text("""
+    DO $$
+    BEGIN
+        IF to_regclass('ix_scheduled_posts_status_time') IS NOT NULL THEN
+            DROP INDEX IF EXISTS ix_scheduled_posts_status;
+        END IF;
+    END
+    $$
+""")
+
+# NOTIFY trigger feeding DBListener: only id + status, far below the 8 KB payload limit
+_NOTIFY_FUNCTION = text("""
+    CREATE OR REPLACE FUNCTION notify_post_updates() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND OLD.status IS NOT DISTINCT FROM NEW.status THEN
+            RETURN NEW;
+        END IF;
+        PERFORM pg_notify('post_updates', json_build_object('post_id', NEW.id, 'status', NEW.status)::text);
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+""")
+_NOTIFY_TRIGGER = text("""
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_scheduled_posts_notify') THEN
+            CREATE TRIGGER trg_scheduled_posts_notify
+            AFTER INSERT OR UPDATE OF status ON scheduled_posts
+            FOR EACH ROW EXECUTE FUNCTION notify_post_updates();
+        END IF;
+    END
+    $$
+""")
+
+
+def _schema_is_current() -> bool:
+    """True when all declared tables/indexes already exist, so create_all can be skipped."""
+    with engine.connect() as conn:
+        return conn.execute(_MISSING_SCHEMA_OBJECTS, {"names": _SCHEMA_OBJECTS}).scalar() == 0
+
+
+def _dedupe_credentials():
+    """Deletes duplicate (client_id, platform, account_id) credentials, keeping the newest row."""
+    with engine.begin() as conn:
+        removed = conn.execute(_DEDUPE_CREDENTIALS).rowcount
+    if removed:
+        logger.warning(f"[Database] Removed {removed} duplicate social credential(s) before indexing.")
+
+
+def _drop_legacy_indexes():
+    """Drops indexes older deployments still carry but the models no longer declare."""
+    with engine.begin() as conn:
+        conn.execute(_DROP_LEGACY_STATUS_INDEX)
+
+
+def _install_notify_trigger():
+    """Idempotently installs the scheduled_posts -> 'post_updates' NOTIFY trigger."""
+    with engine.begin() as conn:
+        conn.execute(_NOTIFY_FUNCTION)
+        conn.execute(_NOTIFY_TRIGGER)
+
+
+def init_db():
+    """
+    Creates missing tables/indexes and the NOTIFY trigger. Safe to run repeatedly.
+    Workers booting together are serialized by an advisory lock; later ones find the schema current.
+    """
+    with engine.connect() as lock_conn:
+        lock_conn.execute(_LOCK, {"key": _BOOTSTRAP_LOCK_KEY})
+        try:
+            _bootstrap()
+        finally:
+            lock_conn.execute(_UNLOCK, {"key": _BOOTSTRAP_LOCK_KEY})
+
+
+def _bootstrap():
+    if _schema_is_current():
+        logger.info("[Database] Schema up to date, skipping create_all.")
+    else:
+        Base.metadata.create_all(bind=engine)
+        # create_all skips tables that already exist, so make sure newly declared indexes are present too.
+        # Each index is created on its own, so one failure doesn't block the rest (or the trigger below)
+        try:
+            _dedupe_credentials()
+        except Exception as e:
+            logger.error(f"[Database] Could not dedupe social credentials: {e}")
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                try:
+                    index.create(bind=engine, checkfirst=True)
+                except Exception as e:
+                    logger.error(f"[Database] Could not create index {index.name}: {e}")
+        logger.info("[Database] PostgreSQL tables verified successfully.")
+    try:
+        _drop_legacy_indexes()
+    except Exception as e:
+        logger.error(f"[Database] Could not drop legacy indexes: {e}")
+    _install_notify_trigger()
+    logger.info("[Database] NOTIFY trigger for 'post_updates' in place.")
+
+
+if __name__ == "__main__":
+    # One-off provisioning for deployments running with EVO_AUTOCREATE=0
+    logging.basicConfig(level=logging.INFO)
+    init_db()
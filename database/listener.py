@@ -1,9 +1,10 @@
 # database/listener.py
-import json
-import select
+import os
+import orjson
+import asyncio
 import logging
-import psycopg2
-from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+import psycopg
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
 # 1. Import DB session and models for time validation
@@ -15,82 +16,199 @@ from services.publisher_manager import process_single_post
 
 logger = logging.getLogger("DB-Listener")
 
+# Bounded pool for publish pipelines so one slow upload doesn't block the rest of a burst
+LISTENER_WORKERS = int(os.getenv("LISTENER_WORKERS", "8"))
+# Bounded hand-off between NOTIFY drainage and publishing; overflow is left to the APScheduler sweep
+LISTENER_QUEUE_SIZE = int(os.getenv("LISTENER_QUEUE_SIZE", "256"))
+# Micro-batching of NOTIFYs: the due-time check runs once per batch instead of once per post
+LISTENER_BATCH_SIZE = 32
+LISTENER_BATCH_DELAY = 0.1  # seconds
+
+# Cluster-wide leader election: only the session holding this advisory lock LISTENs,
+# so N workers/containers keep one listener connection instead of N
+LISTENER_LOCK_KEY = 9182734
+LISTENER_STANDBY_RETRY = int(os.getenv("LISTENER_STANDBY_RETRY", "30"))  # seconds
+
+
+def _split_due(post_ids: list[int]) -> set[int]:
+    """
+    HYBRID ARCHITECTURE LOGIC: returns the posts from a NOTIFY batch that are due now.
+    Future posts are left for the APScheduler. One SELECT covers the whole batch (runs in a worker thread).
+    """
+    # Get current UTC time (naive, to match your DB schema)
+    current_utc = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    # Open a brief DB session to check the scheduled times
+    db = SessionLocal()
+    try:
+        rows = db.query(ScheduledPost.id, ScheduledPost.scheduled_time).filter(
+            ScheduledPost.id.in_(post_ids)
+        ).all()
+    except Exception as db_err:
+        logger.error("Error validating post time: %s", db_err)
+        return set()
+    finally:
+        # Always close the session to prevent connection leaks
+        db.close()
+
+    due = set()
+    for post_id, scheduled_time in rows:
+        # Compare if the scheduled time is in the past or exactly now
+        if scheduled_time <= current_utc:
+            # It's an immediate post. Publish right away!
+            logger.info("⚡ [Real-Time] Post %s is ready NOW. Executing...", post_id)
+            due.add(post_id)
+        else:
+            # It's a future post. The Listener ignores it.
+            # The APScheduler will pick it up when the time comes.
+            logger.info("⏳ [Real-Time] Post %s is scheduled for the FUTURE (%s). Ignoring event.", post_id, scheduled_time)
+    return due
+
 
 class DBListener:
     def __init__(self, db_url: str):
         self.db_url = db_url
         self.conn = None
         self.channel = "post_updates"
+        # Post IDs queued or running; repeated NOTIFYs for the same row are dropped
+        self._inflight: set[int] = set()
+        self.queue: asyncio.Queue[int] = asyncio.Queue(maxsize=LISTENER_QUEUE_SIZE)
+        # Due posts waiting for a publish worker; bounded so a busy pool backs up into self.queue
+        self._ready: asyncio.Queue[int] = asyncio.Queue(maxsize=LISTENER_WORKERS)
+        self.notify_dropped_total = 0
+        # Dedicated pool (not FastAPI's default threadpool); shut down with the listener
+        self.executor = ThreadPoolExecutor(max_workers=LISTENER_WORKERS, thread_name_prefix="db-listener")
 
-    def connect(self):
+    async def connect(self) -> bool:
+        """
+        Opens the LISTEN connection if this process wins the advisory lock.
+        Returns False (and holds no connection) when another worker is already the listener.
+        """
+        conn = await psycopg.AsyncConnection.connect(self.db_url, autocommit=True)
         try:
-            self.conn = psycopg2.connect(self.db_url)
-            self.conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-            cursor = self.conn.cursor()
-            cursor.execute(f"LISTEN {self.channel};")
-            logger.info(f"Connected to DB. Listening on channel: '{self.channel}'")
-        except Exception as e:
-            logger.error(f"Error connecting to database for LISTEN: {e}")
+            cur = await conn.execute("SELECT pg_try_advisory_lock(%s)", (LISTENER_LOCK_KEY,))
+            if not (await cur.fetchone())[0]:
+                await conn.close()
+                return False
+
+            await conn.execute(f"LISTEN {self.channel};")
+        except Exception:
+            await conn.close()
             raise
 
-    def start_listening(self):
-        """
-        Wait for notifications and trigger the Manager logic conditionally.
-        It evaluates if the post is for NOW or the FUTURE.
-        """
-        if not self.conn:
-            self.connect()
+        self.conn = conn
+        logger.info("Connected to DB. Listening on channel: '%s'", self.channel)
+        return True
+
+    async def _next_batch(self) -> list[int]:
+        """Waits for one post id, then collects more for up to LISTENER_BATCH_DELAY / LISTENER_BATCH_SIZE."""
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + LISTENER_BATCH_DELAY
+        while len(batch) < LISTENER_BATCH_SIZE:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _batcher(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                # Default executor, not self.executor: publishes can hold those threads for minutes
+                due = await asyncio.to_thread(_split_due, batch)
+                for post_id in batch:
+                    if post_id in due:
+                        await self._ready.put(post_id)
+                    else:
+                        self._inflight.discard(post_id)
+            except Exception as e:
+                logger.error("Error dispatching batch %s: %s", batch, e)
+                self._inflight.difference_update(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            post_id = await self._ready.get()
+            try:
+                await loop.run_in_executor(self.executor, process_single_post, post_id)
+            except Exception as e:
+                logger.error("Error dispatching Post %s: %s", post_id, e)
+            finally:
+                self._inflight.discard(post_id)
+
+    def _enqueue(self, post_id: int):
+        try:
+            self.queue.put_nowait(post_id)
+            self._inflight.add(post_id)
+        except asyncio.QueueFull:
+            # Row stays 'pending', so the scheduler's sweep still publishes it
+            self.notify_dropped_total += 1
+            logger.warning(
+                "⚠️ [Real-Time] Queue full, Post %s left to the scheduler (dropped so far: %d)",
+                post_id, self.notify_dropped_total
+            )
+
+    async def _listen(self):
+        """Connects (or stands by) and drains notifications until the connection drops."""
+        # Standby workers re-check periodically; the lock frees when the leader's session ends
+        while not await self.connect():
+            logger.info("Another worker holds the listener lock. Standing by (%ss).", LISTENER_STANDBY_RETRY)
+            await asyncio.sleep(LISTENER_STANDBY_RETRY)
 
         logger.info("Event-Driven Listener active.")
+        async for notify in self.conn.notifies():
+            try:
+                payload = orjson.loads(notify.payload)
+                post_id = payload.get("post_id")
 
+                # Check if the post is pending, has a valid ID and isn't already being handled
+                if payload.get("status") == "pending" and post_id and post_id not in self._inflight:
+                    # Workers run the blocking DB + publisher work; keep reading notifications
+                    self._enqueue(post_id)
+
+            except Exception as e:
+                logger.error("Error processing notification: %s", e)
+
+    async def start_listening(self):
+        """
+        Wait for notifications on the event loop and trigger the Manager logic conditionally.
+        It evaluates if the post is for NOW or the FUTURE.
+        Connection failures are retried with exponential backoff (capped at 60s) instead of spin-logging.
+        """
+        workers = [asyncio.create_task(self._batcher())]
+        workers += [asyncio.create_task(self._worker()) for _ in range(LISTENER_WORKERS)]
+        attempt = 0
         try:
             while True:
-                # Wait for up to 60 seconds for a notification
-                if select.select([self.conn], [], [], 60) == ([], [], []):
-                    logger.debug("Heartbeat: Listener waiting...")
-                else:
-                    self.conn.poll()
-                    while self.conn.notifies:
-                        notify = self.conn.notifies.pop(0)
-                        try:
-                            payload = json.loads(notify.payload)
-                            post_id = payload.get("post_id")
-
-                            # Check if the post is pending and has a valid ID
-                            if payload.get("status") == "pending" and post_id:
-
-                                # --- HYBRID ARCHITECTURE LOGIC: Time Validation ---
-                                # Open a brief DB session to check the scheduled time
-                                db = SessionLocal()
-                                try:
-                                    post = db.query(ScheduledPost).filter(ScheduledPost.id == post_id).first()
-
-                                    if post:
-                                        # Get current UTC time (naive, to match your DB schema)
-                                        current_utc = datetime.now(timezone.utc).replace(tzinfo=None)
-
-                                        # Compare if the scheduled time is in the past or exactly now
-                                        if post.scheduled_time <= current_utc:
-                                            # It's an immediate post. Publish right away!
-                                            logger.info(f"⚡ [Real-Time] Post {post_id} is ready NOW. Executing...")
-                                            process_single_post(post_id)
-                                        else:
-                                            # It's a future post. The Listener ignores it.
-                                            # The APScheduler will pick it up when the time comes.
-                                            logger.info(
-                                                f"⏳ [Real-Time] Post {post_id} is scheduled for the FUTURE ({post.scheduled_time}). Ignoring event.")
-
-                                except Exception as db_err:
-                                    logger.error(f"Error validating post time: {db_err}")
-                                finally:
-                                    # Always close the session to prevent connection leaks
-                                    db.close()
-                                    # --------------------------------------------------
-
-                        except Exception as e:
-                            logger.error(f"Error processing notification: {e}")
-        except Exception as e:
-            logger.error(f"Listener loop crashed: {e}")
+                try:
+                    await self._listen()
+                    attempt = 0
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if self.conn:
+                        # We were connected, so this is a fresh outage: restart the backoff
+                        attempt = 0
+                    delay = min(60, 2 ** attempt)
+                    attempt += 1
+                    logger.error("Listener loop crashed (attempt %d), retrying in %ds: %s", attempt, delay, e)
+                    await asyncio.sleep(delay)
+                finally:
+                    if self.conn:
+                        await self.conn.close()
+                        self.conn = None
+        except asyncio.CancelledError:
+            logger.info("Event-Driven Listener stopped.")
+            raise
         finally:
-            if self.conn:
-                self.conn.close()
\ No newline at end of file
+            for worker in workers:
+                worker.cancel()
+            # Queued dispatches are dropped (rows stay 'pending' for the scheduler); running ones finish
+            self.executor.shutdown(wait=False, cancel_futures=True)
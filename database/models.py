@@ -1,5 +1,5 @@
 # database/models.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -18,6 +18,10 @@ class Client(Base):
     scheduled_posts = relationship("ScheduledPost", back_populates="client", cascade="all, delete")
 
 
+# Unique social-network identifier stored inside token_data (supports several accounts per platform)
+CREDENTIAL_ACCOUNT_KEY = text("(COALESCE(token_data ->> 'account_id', ''))")
+
+
 class SocialCredential(Base):
     __tablename__ = "social_credentials"
 
@@ -29,6 +33,11 @@ class SocialCredential(Base):
 
     client = relationship("Client", back_populates="credentials")
 
+    # One row per linked account, so OAuth callbacks can upsert in a single statement
+    __table_args__ = (
+        Index("uq_social_credentials_account", "client_id", "platform", CREDENTIAL_ACCOUNT_KEY, unique=True),
+    )
+
 
 class ScheduledPost(Base):
     __tablename__ = "scheduled_posts"
@@ -40,7 +49,15 @@ class ScheduledPost(Base):
     description = Column(Text, nullable=True)
     platforms = Column(JSONB, nullable=False)           # e.g., '["youtube", "tiktok"]'
     scheduled_time = Column(DateTime, nullable=False)
-    status = Column(String(20), default="pending", index=True) # pending, processing, completed, error
+    status = Column(String(20), default="pending") # uploading, pending, processing, completed, failed
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    client = relationship("Client", back_populates="scheduled_posts")
\ No newline at end of file
+    client = relationship("Client", back_populates="scheduled_posts")
+
+    # Partial index backing the pending-queue scans (scheduler + paginated /pending listing)
+    __table_args__ = (
+        Index(
+            "ix_scheduled_posts_status_time", "status", "scheduled_time",
+            postgresql_where=text("status = 'pending'")
+        ),
+    )
\ No newline at end of file
@@ -1,7 +1,11 @@
 # database/session.py
 import os
+from uuid import uuid4
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 # Load environment variables from the .env file
@@ -13,13 +17,88 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("CRITICAL: DATABASE_URL environment variable is not set in the .env file.")
 
+# Direct (session-mode) URL for LISTEN; LISTEN can't go through a transaction-mode pooler
+DATABASE_URL_LISTEN = os.getenv("DATABASE_URL_LISTEN") or DATABASE_URL
+
+# Set DB_PGBOUNCER=1 when DATABASE_URL points at PgBouncer in transaction mode:
+# PgBouncer owns the pooling, and server-side prepared statements can't be reused across backends
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER") == "1"
+
+# Pool sizing: every web worker process has its own pools, so one connection budget is split across
+# WEB_CONCURRENCY workers (keep it under Postgres' max_connections, minus the listener and admin sessions)
+DB_CONNECTION_BUDGET = int(os.getenv("DB_CONNECTION_BUDGET", "80"))
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+_WORKER_BUDGET = DB_CONNECTION_BUDGET // WEB_CONCURRENCY
+# Smallest split that still leaves each pool a connection (pool_size=0 would mean "unbounded")
+_MIN_WORKER_BUDGET = 4
+
+if _WORKER_BUDGET < _MIN_WORKER_BUDGET:
+    raise ValueError(
+        f"CRITICAL: DB_CONNECTION_BUDGET={DB_CONNECTION_BUDGET} is too small for WEB_CONCURRENCY={WEB_CONCURRENCY} "
+        f"(needs at least {_MIN_WORKER_BUDGET} connections per worker)."
+    )
+
+# Sync engine gets 3/4 (shared by threadpool routes, the scheduler and publishers), async routes the rest
+_SYNC_BUDGET = _WORKER_BUDGET * 3 // 4
+ASYNC_POOL_CAPACITY = _WORKER_BUDGET - _SYNC_BUDGET
+
+DB_POOL_SIZE = max(1, int(os.getenv("DB_POOL_SIZE", _SYNC_BUDGET // 2)))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", _SYNC_BUDGET - _SYNC_BUDGET // 2))
+_ASYNC_POOL_SIZE = max(1, ASYNC_POOL_CAPACITY // 2)
+
+if DB_PGBOUNCER:
+    _sync_pool_args = {"poolclass": NullPool}
+    _async_pool_args = {"poolclass": NullPool}
+    _async_connect_args = {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        # Unique names so statements prepared on one backend never collide on another
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+    }
+else:
+    # LIFO reuse keeps the hottest connections warm
+    _sync_pool_args = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_pre_ping": True,
+        "pool_recycle": 1800,
+        "pool_timeout": 10,
+        "pool_use_lifo": True,
+    }
+    # pre_ping discards stale connections; recycle keeps them under typical idle timeouts.
+    _async_pool_args = {
+        "pool_size": _ASYNC_POOL_SIZE,
+        "max_overflow": ASYNC_POOL_CAPACITY - _ASYNC_POOL_SIZE,
+        "pool_pre_ping": True,
+        "pool_recycle": 1800,
+    }
+    _async_connect_args = {}
+
 # Create the SQLAlchemy engine
 # echo=False prevents it from printing every SQL query to the console
-engine = create_engine(DATABASE_URL, echo=False)
+# libpq keepalives detect dead peers early
+engine = create_engine(
+    DATABASE_URL,
+    echo=False,
+    connect_args={"application_name": "evo_omni", "keepalives": 1, "keepalives_idle": 30},
+    **_sync_pool_args
+)
 
 # Create a configured "Session" class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# --- ASYNC ENGINE (asyncpg) ---
+# Used by async routes so DB I/O doesn't block the event loop.
+ASYNC_DATABASE_URL = make_url(DATABASE_URL).set(drivername="postgresql+asyncpg")
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    connect_args=_async_connect_args,
+    **_async_pool_args
+)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
 # Base class for our ORM models
 Base = declarative_base()
 
@@ -29,4 +108,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Async dependency for `async def` routes
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,25 @@
+# gunicorn_conf.py
+# Production entrypoint:  gunicorn main:app -c gunicorn_conf.py
+# (`python main.py` stays the single-process dev runner with reload)
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+# Async workers don't need 2*cpu+1; each one opens its own DB pools, so the default is capped.
+# Lifespan runs in every worker: the DB listener, schema bootstrap and scheduler jobs
+# elect themselves through Postgres advisory locks
+workers = int(os.getenv("WEB_CONCURRENCY", min((os.cpu_count() or 1) * 2 + 1, 4)))
+# Workers are forked after this runs, so database/session.py splits the connection budget across them
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Keep lifespan per-worker (no fork of open DB/HTTP pools from the master)
+preload_app = False
+
+keepalive = 30
+# Large video uploads stream for a while before the handler returns
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+
+accesslog = None
+errorlog = "-"
@@ -1,6 +1,6 @@
-import requests
 import logging
 import time
+from publishers.http_session import graph_session, DEFAULT_TIMEOUT
 
 # Set up specialized logger for Facebook
 logger = logging.getLogger("EVO-Facebook")
@@ -29,7 +29,7 @@ class FacebookPublisher:
                 "fields": "access_token",
                 "access_token": self.access_token
             }
-            res = requests.get(url, params=params).json()
+            res = graph_session.get(url, params=params, timeout=DEFAULT_TIMEOUT).json()
             return res.get("access_token")
         except Exception as e:
             logger.error(f"[FB] Error fetching Page Token: {e}")
@@ -55,7 +55,7 @@ class FacebookPublisher:
                 "upload_phase": "start",
                 "access_token": page_token
             }
-            init_res = requests.post(init_url, data=init_payload).json()
+            init_res = graph_session.post(init_url, data=init_payload, timeout=DEFAULT_TIMEOUT).json()
 
             video_id = init_res.get("video_id")
             if not video_id:
@@ -76,7 +76,7 @@ class FacebookPublisher:
                 "file_url": video_url
             }
 
-            upload_res = requests.post(upload_url, headers=upload_headers).json()
+            upload_res = graph_session.post(upload_url, headers=upload_headers, timeout=(3, 30)).json()
 
             if not upload_res.get("success"):
                 logger.error(f"[FB] Pull request failed. Response: {upload_res}")
@@ -97,7 +97,7 @@ class FacebookPublisher:
                     "fields": "status",
                     "access_token": page_token
                 }
-                status_res = requests.get(status_url, params=status_params).json()
+                status_res = graph_session.get(status_url, params=status_params, timeout=DEFAULT_TIMEOUT).json()
 
                 logger.info(f"[FB] Polling Attempt {attempt}/{max_attempts} - Full Response: {status_res}")
 
@@ -132,7 +132,7 @@ class FacebookPublisher:
                 "description": description,
                 "access_token": page_token
             }
-            final_res = requests.post(init_url, data=finish_payload).json()
+            final_res = graph_session.post(init_url, data=finish_payload, timeout=DEFAULT_TIMEOUT).json()
 
             if final_res.get("success"):
                 logger.info(f"✅ [FB] Reel published successfully to Page {target_id}")
@@ -0,0 +1,33 @@
+# publishers/http_session.py
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) seconds: a stalled upstream fails fast instead of pinning a scheduler worker
+DEFAULT_TIMEOUT = (3, 10)
+
+
+def _pooled_session(pool_connections: int = 20, pool_maxsize: int = 50) -> requests.Session:
+    """
+    Builds a requests Session whose keep-alive pool is reused across publisher calls,
+    so consecutive API hits skip the TCP + TLS handshake.
+    Transient gateway errors are retried with backoff; status/read retries are limited to GET
+    so non-idempotent publish POSTs are never replayed (connection failures still retry).
+    """
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=frozenset({"GET"}),
+        raise_on_status=False
+    )
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# One persistent session per upstream platform
+graph_session = _pooled_session()   # graph.facebook.com / rupload.facebook.com (Facebook + Instagram)
+tiktok_session = _pooled_session()  # open.tiktokapis.com + TikTok upload hosts
@@ -1,6 +1,6 @@
-import requests
 import time
 import logging
+from publishers.http_session import graph_session, DEFAULT_TIMEOUT
 
 logger = logging.getLogger("EVO-Instagram")
 
@@ -43,7 +43,7 @@ class InstagramPublisher:
             "access_token": self.access_token
         }
         try:
-            response = requests.post(url, data=payload, timeout=30)
+            response = graph_session.post(url, data=payload, timeout=(3, 30))
             data = response.json()
             if response.status_code == 200:
                 logger.info(f"[Instagram] Container created: {data['id']}")
@@ -60,7 +60,7 @@ class InstagramPublisher:
 
         for i in range(retries):
             try:
-                res = requests.get(url, params=params).json()
+                res = graph_session.get(url, params=params, timeout=DEFAULT_TIMEOUT).json()
                 status = res.get("status_code")
                 logger.info(f"[Instagram] Processing status: {status} (Attempt {i + 1})")
 
@@ -78,7 +78,7 @@ class InstagramPublisher:
         url = f"{self.base_url}/{self.ig_id}/media_publish"
         payload = {"creation_id": container_id, "access_token": self.access_token}
         try:
-            res = requests.post(url, data=payload).json()
+            res = graph_session.post(url, data=payload, timeout=DEFAULT_TIMEOUT).json()
             if "id" in res:
                 logger.info(f"✅ [Instagram] Reel published successfully! ID: {res['id']}")
                 return True
@@ -7,6 +7,7 @@ import math
 import time
 from sqlalchemy.orm import Session
 from database.models import SocialCredential
+from publishers.http_session import tiktok_session, DEFAULT_TIMEOUT
 
 logger = logging.getLogger("TikTok-API")
 
@@ -17,7 +18,7 @@ def refresh_tiktok_token(client_id: int, db: Session, old_token_data: dict):
     """
     try:
         logger.info(f"Refreshing TikTok token for client {client_id}")
-        response = requests.post(
+        response = tiktok_session.post(
             "https://open.tiktokapis.com/v2/oauth/token/",
             headers={"Content-Type": "application/x-www-form-urlencoded"},
             data={
@@ -25,7 +26,8 @@ def refresh_tiktok_token(client_id: int, db: Session, old_token_data: dict):
                 "client_secret": os.getenv("TIKTOK_CLIENT_SECRET"),
                 "grant_type": "refresh_token",
                 "refresh_token": old_token_data.get("refresh_token")
-            }
+            },
+            timeout=DEFAULT_TIMEOUT
         )
         new_data = response.json()
 
@@ -95,7 +97,7 @@ def upload_video_to_tiktok(video_path: str, title: str, token_data: dict, client
             }
         }
 
-        res = requests.post(init_url, headers=headers, json=payload)
+        res = tiktok_session.post(init_url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
         res_json = res.json()
 
         # Handle token expiration
@@ -104,7 +106,7 @@ def upload_video_to_tiktok(video_path: str, title: str, token_data: dict, client
             new_tokens = refresh_tiktok_token(client_id, db, token_data)
             if new_tokens:
                 headers["Authorization"] = f"Bearer {new_tokens['access_token']}"
-                res = requests.post(init_url, headers=headers, json=payload)
+                res = tiktok_session.post(init_url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
                 res_json = res.json()
             else:
                 return False
@@ -143,7 +145,7 @@ def upload_video_to_tiktok(video_path: str, title: str, token_data: dict, client
                 chunk_success = False
                 for attempt in range(1, MAX_RETRIES + 1):
                     try:
-                        put_response = requests.put(upload_url, data=chunk_data, headers=upload_headers, timeout=60)
+                        put_response = tiktok_session.put(upload_url, data=chunk_data, headers=upload_headers, timeout=60)
 
                         if put_response.status_code in [200, 201, 206]:
                             logger.info(f"[TikTok] Chunk {i + 1}/{total_chunk_count} uploaded successfully.")
@@ -221,7 +223,7 @@ def upload_photos_to_tiktok(photo_urls: list, title: str, token_data: dict, clie
             "media_type": "PHOTO"
         }
 
-        res = requests.post(init_url, headers=headers, json=payload)
+        res = tiktok_session.post(init_url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
         res_json = res.json()
 
         # Handle token expiration automatically
@@ -230,7 +232,7 @@ def upload_photos_to_tiktok(photo_urls: list, title: str, token_data: dict, clie
             new_tokens = refresh_tiktok_token(client_id, db, token_data)
             if new_tokens:
                 headers["Authorization"] = f"Bearer {new_tokens['access_token']}"
-                res = requests.post(init_url, headers=headers, json=payload)
+                res = tiktok_session.post(init_url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
                 res_json = res.json()
             else:
                 return False
@@ -1,13 +1,82 @@
 # publishers/youtube.py
 import os
+import json
 import logging
+from datetime import datetime
+from functools import lru_cache
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
+from google.auth.exceptions import RefreshError
 from google.auth.transport.requests import Request
 
 logger = logging.getLogger("YouTube-API")
 
+# --- GOOGLE APP CONFIGURATION ---
+# The app's client secret lives only in this file; credential rows never store it
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLIENT_SECRETS_FILE = os.path.join(BASE_DIR, "credentials", "client_secret_251021151101.json")
+
+
+@lru_cache(maxsize=1)
+def load_youtube_client_secrets() -> dict:
+    """
+    Parses the Google client secrets file once per process and keeps it in memory.
+    """
+    with open(CLIENT_SECRETS_FILE, "rb") as f:
+        return json.loads(f.read())
+
+
+def load_youtube_client_config() -> dict:
+    """
+    Returns the Google OAuth client section ('web' or 'installed') from the cached secrets.
+    """
+    secrets = load_youtube_client_secrets()
+    return secrets.get("web") or secrets.get("installed")
+
+
+def _build_credentials(token_data: dict) -> Credentials:
+    """
+    Reconstructs Google credentials from the stored JSON (expiry is naive UTC ISO-8601).
+    """
+    expiry = token_data.get('expiry')
+    return Credentials(
+        token=token_data.get('token'),
+        refresh_token=token_data.get('refresh_token'),
+        token_uri=token_data.get('token_uri'),
+        client_id=token_data.get('client_id'),
+        client_secret=load_youtube_client_config()["client_secret"],
+        scopes=token_data.get('scopes'),
+        expiry=datetime.fromisoformat(expiry) if expiry else None
+    )
+
+
+def refresh_youtube_token(token_data: dict):
+    """
+    Refreshes the access token out-of-band and returns the updated token_data (None on transient failure).
+    A revoked/expired refresh token comes back with 'refresh_token' cleared and 'reauth_required' set,
+    so the proactive refresh stops retrying it until the account is linked again.
+    """
+    # Rows written before the secret moved out of token_data drop it on their next refresh
+    stored = {k: v for k, v in token_data.items() if k != 'client_secret'}
+    try:
+        credentials = _build_credentials(token_data)
+        credentials.refresh(Request())
+        return {
+            **stored,
+            'token': credentials.token,
+            'expiry': credentials.expiry.isoformat() if credentials.expiry else None
+        }
+    except RefreshError as e:
+        if "invalid_grant" in str(e):
+            logger.error(f"❌ YouTube refresh token revoked or expired, account must be re-linked: {str(e)}")
+            return {**stored, 'refresh_token': None, 'reauth_required': True}
+        logger.error(f"❌ YouTube token refresh failed: {str(e)}")
+        return None
+    except Exception as e:
+        logger.error(f"❌ YouTube token refresh failed: {str(e)}")
+        return None
+
 
 def upload_video(video_path, title, description, token_data):
     """
@@ -18,14 +87,7 @@ def upload_video(video_path, title, description, token_data):
 
     try:
         # 1. Reconstruct credentials from the database JSON
-        credentials = Credentials(
-            token=token_data.get('token'),
-            refresh_token=token_data.get('refresh_token'),
-            token_uri=token_data.get('token_uri'),
-            client_id=token_data.get('client_id'),
-            client_secret=token_data.get('client_secret'),
-            scopes=token_data.get('scopes')
-        )
+        credentials = _build_credentials(token_data)
 
         # 2. Refresh the token if it has expired
         if credentials.expired:
@@ -1,6 +1,7 @@
 # services/publisher_manager.py
 import os
 import logging
+from pathlib import Path
 from database.session import SessionLocal
 from database.models import ScheduledPost, SocialCredential
 from storage.oracle_s3 import download_video
@@ -14,6 +15,10 @@ from publishers.facebook import FacebookPublisher
 
 logger = logging.getLogger("Publisher-Manager")
 
+# Local staging directory (served at /temp so Meta can pull the video); created once at import
+TEMP_MEDIA_DIR = Path("temp_media")
+TEMP_MEDIA_DIR.mkdir(exist_ok=True)
+
 # Update this with your actual duckdns domain
 BASE_PUBLIC_URL = "https://evo-omni-engine.duckdns.org/temp"
 
@@ -37,10 +42,8 @@ def process_single_post(post_id: int):
         logger.info(f"[Manager] Starting orchestration for Post {post_id} (Client {post.client_id})")
 
         # 2. Directory management (Using the mounted /temp_media for Meta compatibility)
-        temp_dir = "temp_media"
-        os.makedirs(temp_dir, exist_ok=True)
         filename = f"video_job_{post.id}.mp4"
-        local_video_path = os.path.join(temp_dir, filename)
+        local_video_path = str(TEMP_MEDIA_DIR / filename)
 
         # 3. Download from Oracle Bucket
         logger.info(f"[Manager] Downloading {post.video_file_id} from Oracle...")
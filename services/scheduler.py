@@ -1,39 +1,69 @@
 # services/scheduler.py
+import random
 import logging
+from contextlib import contextmanager
 from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
+from sqlalchemy import DateTime, select, text, update
 
-from database.session import SessionLocal
-from database.models import ScheduledPost
+from database.session import SessionLocal, engine
+from database.models import ScheduledPost, SocialCredential
 from services.publisher_manager import process_single_post
+from publishers.youtube import refresh_youtube_token
 
 logger = logging.getLogger("Scheduler")
 
+# Every web worker runs this scheduler; each job only runs in the worker holding its advisory lock
+PENDING_POSTS_LOCK_KEY = 9182736
+TOKEN_REFRESH_LOCK_KEY = 9182737
+
+
+@contextmanager
+def _job_lock(key: int):
+    """Yields True if this worker won the job's advisory lock; it is held until the job finishes."""
+    with engine.connect() as conn:
+        acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar()
+        # The lock is session-level, so don't sit 'idle in transaction' while the job runs
+        conn.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+                conn.commit()
+
 
 def process_pending_posts():
     """Job that runs every minute to check for and publish pending videos."""
     db = SessionLocal()
     try:
-        # ✨ 1. Fetch posts where the scheduled_time has passed and are still pending
-        # FIX: Replaced deprecated utcnow() with timezone-aware UTC datetime
-        current_utc_time = datetime.now(timezone.utc)
-
-        pending_posts = db.query(ScheduledPost).filter(
-            ScheduledPost.status == "pending",
-            ScheduledPost.scheduled_time <= current_utc_time
-        ).all()
-
-        if not pending_posts:
-            return
-
-        for post in pending_posts:
-            logger.info(f"⏰ Time reached for Post ID: {post.id}. Delegating to Manager...")
-            # Switch status to 'processing' to avoid duplicate executions in the next cycle
-            post.status = "processing"
+        with _job_lock(PENDING_POSTS_LOCK_KEY) as leader:
+            if not leader:
+                return
+
+            # ✨ 1. Claim posts where the scheduled_time has passed and are still pending
+            # FIX: Replaced deprecated utcnow() with timezone-aware UTC datetime
+            current_utc_time = datetime.now(timezone.utc)
+
+            # Atomic claim: 'pending' -> 'processing' in one statement, skipping rows another session holds,
+            # so no other scheduler or worker can pick the same post up
+            due_ids = select(ScheduledPost.id).where(
+                ScheduledPost.status == "pending",
+                ScheduledPost.scheduled_time <= current_utc_time
+            ).with_for_update(skip_locked=True)
+            claimed_ids = db.execute(
+                update(ScheduledPost)
+                .where(ScheduledPost.id.in_(due_ids))
+                .values(status="processing")
+                .returning(ScheduledPost.id)
+            ).scalars().all()
             db.commit()
 
-            # ✨ 2. Delegate ALL the heavy lifting to the Manager (DRY Principle applied)
-            process_single_post(post.id)
+            for post_id in sorted(claimed_ids):
+                logger.info(f"⏰ Time reached for Post ID: {post_id}. Delegating to Manager...")
+
+                # ✨ 2. Delegate ALL the heavy lifting to the Manager (DRY Principle applied)
+                process_single_post(post_id)
 
     except Exception as e:
         logger.error(f"Error in process_pending_posts: {e}")
@@ -41,8 +71,49 @@ def process_pending_posts():
         db.close()
 
 
+# --- PROACTIVE TOKEN REFRESH ---
+TOKEN_REFRESH_WINDOW = timedelta(minutes=5)
+TOKEN_REFRESH_JITTER_SECONDS = 60
+
+
+def refresh_expiring_youtube_tokens():
+    """Job that refreshes YouTube tokens about to expire, so uploads never pay the refresh latency."""
+    db = SessionLocal()
+    try:
+        with _job_lock(TOKEN_REFRESH_LOCK_KEY) as leader:
+            if not leader:
+                return
+
+            # Jitter spreads refreshes of tokens issued together across several cycles
+            window = TOKEN_REFRESH_WINDOW + timedelta(seconds=random.uniform(0, TOKEN_REFRESH_JITTER_SECONDS))
+            # Stored expiries are naive UTC, so compare against a naive UTC threshold
+            threshold = datetime.now(timezone.utc).replace(tzinfo=None) + window
+
+            expiring = db.query(SocialCredential).filter(
+                SocialCredential.platform == "youtube",
+                SocialCredential.token_data["refresh_token"].astext.isnot(None),
+                SocialCredential.token_data["expiry"].astext.cast(DateTime) < threshold
+            ).all()
+
+            for cred in expiring:
+                new_data = refresh_youtube_token(cred.token_data)
+                if new_data:
+                    cred.token_data = new_data
+                    db.commit()
+                    if new_data.get("reauth_required"):
+                        logger.warning(f"⚠️ YouTube credential {cred.id} was revoked and needs to be re-linked")
+                    else:
+                        logger.info(f"🔄 Refreshed YouTube token for credential {cred.id}")
+
+    except Exception as e:
+        logger.error(f"Error in refresh_expiring_youtube_tokens: {e}")
+    finally:
+        db.close()
+
+
 scheduler = BackgroundScheduler()
 scheduler.add_job(process_pending_posts, 'interval', minutes=1)
+scheduler.add_job(refresh_expiring_youtube_tokens, 'interval', minutes=1)
 
 
 def start_scheduler():
@@ -6,11 +6,11 @@ def get_smart_title(text: str, max_length: int = 60) -> str:
     if not text:
         return "Untitled Post"
 
-    # 1. Try to split by the first newline
-    first_line = text.split('\n')[0].strip()
+    # 1. Try to split by the first newline (partition stops at the first match, no list of all lines)
+    first_line = text.partition('\n')[0].strip()
 
     # 2. Try to split by the first period within that line
-    first_sentence = first_line.split('.')[0].strip()
+    first_sentence = first_line.partition('.')[0].strip()
 
     # 3. Use the sentence if it's meaningful, otherwise use a clean truncation
     title = first_sentence if first_sentence else first_line
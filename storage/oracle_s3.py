@@ -1,8 +1,10 @@
 # storage/oracle_s3.py
 import oci
 import os
+import threading
 import logging
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 
 load_dotenv()
 logger = logging.getLogger("Storage")
@@ -10,20 +12,65 @@ logger = logging.getLogger("Storage")
 # Version Marker for Debugging
 VERSION = "3.0.1-FINAL"
 
+# Multipart tuning for streamed uploads (part size and threshold in MiB)
+MULTIPART_PART_SIZE = int(os.getenv("OCI_PART_SIZE_MB", "8")) * 1024 * 1024
+MULTIPART_THRESHOLD = int(os.getenv("OCI_MULTIPART_THRESHOLD_MB", "16")) * 1024 * 1024
+PARALLEL_PART_UPLOADS = int(os.getenv("OCI_PARALLEL_UPLOADS", "8"))
+
+_oci_client = None
+_oci_client_lock = threading.Lock()
+
+
 def get_oci_client():
-    """Initializes the OCI Object Storage client using RSA keys."""
-    config = {
-        "user": os.getenv("ORACLE_USER_OCID"),
-        "key_file": os.getenv("ORACLE_KEY_FILE"),
-        "fingerprint": os.getenv("ORACLE_FINGERPRINT"),
-        "tenancy": os.getenv("ORACLE_TENANCY_OCID"),
-        "region": os.getenv("ORACLE_REGION")
-    }
-    return oci.object_storage.ObjectStorageClient(config)
-
-def upload_video(local_file_path: str, object_name: str) -> bool:
-    """Uploads a video to Oracle Cloud with extreme logging [V3]."""
-    logger.info(f"🚀 [OCI-V3] ATTEMPTING UPLOAD: {object_name} (from {local_file_path})")
+    """
+    Returns the shared OCI Object Storage client (RSA keys), built once per process.
+    Reusing it keeps the signer, TLS context and keep-alive pool across uploads/downloads.
+    """
+    global _oci_client
+    if _oci_client is None:
+        with _oci_client_lock:
+            if _oci_client is None:
+                config = {
+                    "user": os.getenv("ORACLE_USER_OCID"),
+                    "key_file": os.getenv("ORACLE_KEY_FILE"),
+                    "fingerprint": os.getenv("ORACLE_FINGERPRINT"),
+                    "tenancy": os.getenv("ORACLE_TENANCY_OCID"),
+                    "region": os.getenv("ORACLE_REGION")
+                }
+                client = oci.object_storage.ObjectStorageClient(config)
+                # Wider keep-alive pool so parallel multipart parts don't open fresh connections
+                client.base_client.session.mount(
+                    "https://", HTTPAdapter(pool_connections=16, pool_maxsize=64)
+                )
+                _oci_client = client
+    return _oci_client
+
+
+def warm_oci_client() -> bool:
+    """
+    Builds the shared client (key file + signer) and opens its first TLS connection,
+    so the first upload after boot doesn't pay for either.
+    """
+    try:
+        get_oci_client().get_namespace()
+        logger.info("🔥 [OCI-V3] Client warmed up (signer loaded, connection pooled)")
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ [OCI-V3] Client warm-up failed (will retry lazily): {str(e)}")
+        return False
+
+
+def _stream_size(file_obj) -> int:
+    """Remaining bytes in a seekable stream (position is preserved)."""
+    start = file_obj.tell()
+    end = file_obj.seek(0, os.SEEK_END)
+    file_obj.seek(start)
+    return end - start
+
+
+def upload_video_stream(file_obj, object_name: str) -> bool:
+    """Streams a file-like object to Oracle Cloud as a multipart upload (no local disk hop) [V3]."""
+    logger.info(f"🚀 [OCI-V3] STREAMING UPLOAD: {object_name}")
     try:
         client = get_oci_client()
         namespace = os.getenv("ORACLE_NAMESPACE")
@@ -31,12 +78,22 @@ def upload_video(local_file_path: str, object_name: str) -> bool:
 
         logger.info(f"📡 [OCI-V3] Target Bucket: {bucket} | Namespace: {namespace}")
 
-        with open(local_file_path, "rb") as f:
-            client.put_object(
-                namespace_name=namespace,
-                bucket_name=bucket,
-                object_name=object_name,
-                put_object_body=f,
+        if _stream_size(file_obj) < MULTIPART_THRESHOLD:
+            # Small clips: one PUT beats the multipart create/commit round-trips
+            client.put_object(namespace, bucket, object_name, file_obj.read(), content_type="video/mp4")
+        else:
+            # Parts are read sequentially from the stream and uploaded in parallel
+            upload_manager = oci.object_storage.UploadManager(
+                client,
+                allow_parallel_uploads=True,
+                parallel_process_count=PARALLEL_PART_UPLOADS
+            )
+            upload_manager.upload_stream(
+                namespace,
+                bucket,
+                object_name,
+                file_obj,
+                part_size=MULTIPART_PART_SIZE,
                 content_type="video/mp4"
             )
 
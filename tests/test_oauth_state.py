@@ -0,0 +1,71 @@
+# tests/test_oauth_state.py
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from itsdangerous import URLSafeTimedSerializer
+
+from api import routes_oauth
+
+CALLBACK = "/api/v1/oauth/callback/youtube"
+
+
+@pytest.fixture
+def fake_exchange(monkeypatch):
+    """Stands in for the provider exchange and the DB upsert; records what reached them."""
+    calls = []
+
+    async def exchange_token(code):
+        calls.append(("exchange", code))
+        return {"access_token": "at", "account_id": "acc-1"}
+
+    async def persist(client_id, platform, token_data):
+        calls.append(("persist", client_id, platform))
+
+    monkeypatch.setitem(routes_oauth.PROVIDERS, "youtube", SimpleNamespace(exchange_token=exchange_token))
+    monkeypatch.setattr(routes_oauth, "_persist_credential", persist)
+    return calls
+
+
+@pytest.mark.parametrize("state", [
+    "not-a-signed-state",
+    URLSafeTimedSerializer("some-other-secret", salt="oauth-state").dumps({"cid": 1}),
+    routes_oauth._SIGNER.dumps({"client": 1}),
+    None,
+])
+def test_callback_rejects_bad_state(client, fake_exchange, state):
+    params = {"code": "abc"} | ({"state": state} if state is not None else {})
+    response = client.get(CALLBACK, params=params)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid or expired OAuth state"
+    assert fake_exchange == []
+
+
+def test_callback_rejects_expired_state(client, fake_exchange, monkeypatch):
+    state = routes_oauth._SIGNER.dumps({"cid": 1})
+    monkeypatch.setattr(routes_oauth, "_STATE_MAX_AGE", -1)
+    response = client.get(CALLBACK, params={"code": "abc", "state": state})
+    assert response.status_code == 400
+    assert fake_exchange == []
+
+
+def test_callback_requires_code(client, fake_exchange):
+    response = client.get(CALLBACK, params={"state": routes_oauth._SIGNER.dumps({"cid": 1})})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Authorization code missing"
+
+
+def test_callback_valid_state_links_account(client, fake_exchange):
+    response = client.get(CALLBACK, params={"code": "abc", "state": routes_oauth._SIGNER.dumps({"cid": 7})})
+    assert response.status_code == 200
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert fake_exchange == [("exchange", "abc"), ("persist", 7, "youtube")]
+
+
+def test_callback_persist_failure_is_503(client, fake_exchange, monkeypatch):
+    async def failing_persist(client_id, platform, token_data):
+        raise HTTPException(status_code=503, detail="Could not save the linked account. Please try again.")
+
+    monkeypatch.setattr(routes_oauth, "_persist_credential", failing_persist)
+    response = client.get(CALLBACK, params={"code": "abc", "state": routes_oauth._SIGNER.dumps({"cid": 7})})
+    assert response.status_code == 503
@@ -0,0 +1,54 @@
+# tests/test_pending.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from database.models import Client, ScheduledPost
+from database.session import SessionLocal
+
+
+@pytest.fixture
+def pending_posts(db_tables):
+    """Seven pending posts (several sharing a scheduled_time) plus a completed one that must never be listed."""
+    base = datetime(2026, 1, 1, 12, 0)
+    times = [base, base, base + timedelta(minutes=5), base, base + timedelta(minutes=1),
+             base + timedelta(minutes=5), base + timedelta(minutes=1)]
+    db = SessionLocal()
+    try:
+        client = Client(name="Paging Client")
+        db.add(client)
+        db.flush()
+        posts = [
+            ScheduledPost(client_id=client.id, video_file_id=f"v{i}.mp4", title=f"Post {i}",
+                          platforms=["youtube"], scheduled_time=t, status="pending")
+            for i, t in enumerate(times)
+        ]
+        posts.append(ScheduledPost(client_id=client.id, video_file_id="done.mp4", title="Done",
+                                   platforms=["youtube"], scheduled_time=base, status="completed"))
+        db.add_all(posts)
+        db.commit()
+        return sorted((p.scheduled_time, p.id) for p in posts if p.status == "pending")
+    finally:
+        db.close()
+
+
+def test_pending_cursor_paging(client, pending_posts):
+    seen, params = [], {"limit": 2}
+    while True:
+        page = client.get("/api/v1/publish/pending", params=params)
+        assert page.status_code == 200
+        items = page.json()
+        if not items:
+            break
+        assert len(items) <= 2
+        assert all(item["status"] == "pending" for item in items)
+        seen += [(datetime.fromisoformat(item["scheduled_time"]), item["id"]) for item in items]
+        params = {"limit": 2, "cursor": items[-1]["scheduled_time"], "cursor_id": items[-1]["id"]}
+
+    # Every pending post exactly once, in (scheduled_time, id) order, across ties on scheduled_time
+    assert seen == pending_posts
+
+
+def test_pending_limit_is_bounded(client):
+    assert client.get("/api/v1/publish/pending", params={"limit": 0}).status_code == 422
+    assert client.get("/api/v1/publish/pending", params={"limit": 501}).status_code == 422
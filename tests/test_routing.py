@@ -0,0 +1,40 @@
+# tests/test_routing.py
+import pytest
+
+VERIFY_FILE = "/tiktokkr6gkTdVdPNh4y3ne0Uok3B5xqWZFqWx.txt"
+
+
+@pytest.mark.parametrize("method, path, status, location", [
+    # Unclaimed methods/slashes keep the router's 405 / redirect handling (no catch-all static mount)
+    ("POST", "/api/v1/publish", 307, "/api/v1/publish/"),
+    ("GET", "/api/v1/publish/web-direct", 405, None),
+    ("GET", "/api/v1/publish/pending/", 307, "/api/v1/publish/pending"),
+    ("HEAD", "/terms", 405, None),
+    ("GET", "/does-not-exist", 404, None),
+])
+def test_router_status_codes(client, method, path, status, location):
+    response = client.request(method, path, follow_redirects=False)
+    assert response.status_code == status
+    if location:
+        assert response.headers["location"].endswith(location)
+
+
+@pytest.mark.parametrize("method", ["GET", "HEAD"])
+def test_verification_file_served_at_root(client, method):
+    response = client.request(method, VERIFY_FILE)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "etag" in response.headers
+
+
+def test_verification_file_revalidates(client):
+    etag = client.get(VERIFY_FILE).headers["etag"]
+    assert client.get(VERIFY_FILE, headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_static_directory_mounted_under_static(client):
+    assert client.get(f"/static{VERIFY_FILE}").status_code == 200
+
+
+def test_head_root_health_probe(client):
+    assert client.head("/").status_code == 200